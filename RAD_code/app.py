@@ -1,9 +1,16 @@
 import streamlit as st
 import requests
+import hashlib
 import tempfile
 import os
+import json
+import time
 from datetime import datetime
 
+BACKEND_URL = os.getenv("RADASSIST_BACKEND_URL", "http://127.0.0.1:8000")
+JOB_POLL_INTERVAL = 1.0
+STREAM_CHUNK_BYTES = 64 * 1024
+
 st.set_page_config(
     layout="wide",
     page_title="RAD-Assist ",
@@ -166,8 +173,38 @@ with col1:
         st.audio(audio_file, format="audio/wav")
         st.session_state.audio_file = audio_file
 
+    live_mode = st.checkbox(
+        "Live transcription",
+        value=False,
+        help="Show text as it is decoded instead of waiting for the whole file"
+    )
+
     if st.button("Transcribe", key="transcribe_btn"):
-        if audio_file is not None:
+        if audio_file is not None and live_mode:
+            live_text = st.empty()
+            try:
+                audio_file.seek(0)
+                chunks = iter(lambda: audio_file.read(STREAM_CHUNK_BYTES), b"")
+                response = requests.post(f"{BACKEND_URL}/transcribe/stream", data=chunks, stream=True)
+                committed, partial = [], ""
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data: "):
+                        continue
+                    event = json.loads(line[len("data: "):])
+                    if event["type"] == "final":
+                        committed.append(event["text"])
+                        partial = ""
+                    elif event["type"] == "partial":
+                        partial = event["text"]
+                    elif event["type"] == "done":
+                        st.session_state.transcription = event["text"]
+                        st.success("✅ Transcription Complete")
+                    elif event["type"] == "error":
+                        st.error(f"❌ Failed to transcribe: {event['detail']}")
+                    live_text.markdown(" ".join(committed) + (f" *{partial}*" if partial else ""))
+            except Exception as e:
+                st.error(f"🚫 Error: {e}")
+        elif audio_file is not None:
             with st.spinner("Transcribing audio..."):
                 
                 progress_bar = st.progress(0)
@@ -175,13 +212,26 @@ with col1:
                 
                 files = {"file": (audio_file.name, audio_file, "audio/wav")}
                 try:
-                    response = requests.post("http://127.0.0.1:8000/transcribe/", files=files)
-                    progress_bar.progress(50)
+                    response = requests.post(f"{BACKEND_URL}/transcribe/jobs", files=files)
                     
-                    if response.status_code == 200:
-                        st.session_state.transcription = response.json()["transcription"]
-                        progress_bar.progress(100)
-                        st.success("✅ Transcription Complete")
+                    if response.status_code == 202:
+                        job_id = response.json()["job_id"]
+                        while True:
+                            job = requests.get(f"{BACKEND_URL}/transcribe/jobs/{job_id}").json()
+                            stage = "Decoding audio" if job.get("stage") == "decode" else "Transcribing"
+                            progress_bar.progress(int(job["progress"] * 100), text=f"{stage}...")
+                            if job["status"] in ("completed", "failed"):
+                                break
+                            time.sleep(JOB_POLL_INTERVAL)
+                        
+                        if job["status"] == "completed":
+                            st.session_state.transcription = job["transcription"]
+                            progress_bar.progress(100)
+                            st.success("✅ Transcription Complete")
+                        else:
+                            st.error(f"❌ Failed to transcribe: {job.get('error')}")
+                    elif response.status_code == 429:
+                        st.warning("The transcription queue is full, please try again shortly.")
                     else:
                         st.error("❌ Failed to transcribe.")
                 except Exception as e:
@@ -221,19 +271,46 @@ with col3:
     col_a, col_b = st.columns(2)
     with col_a:
         report_date = st.date_input("Report Date", datetime.now())
+        patient_id = st.text_input("Patient ID", key="patient_id")
     with col_b:
         report_time = st.time_input("Report Time", datetime.now())
+        study_id = st.text_input("Study ID", key="study_id")
     
     if st.button("🖨️ Submit Report", key="submit_btn"):
         if report_text:
-            st.success("✅ Report submitted successfully!")
-           
-            filename = f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-            with open(filename, "w") as f:
-                f.write(f"Date: {report_date}\n")
-                f.write(f"Time: {report_time}\n\n")
-                f.write(report_text)
-            st.info(f"Report saved as: {filename}")
+            audio = st.session_state.audio_file
+            report = {
+                "report_text": report_text,
+                "report_date": report_date.isoformat(),
+                "report_time": report_time.isoformat(timespec="seconds"),
+                "transcript": st.session_state.get("transcription", ""),
+                "patient_id": patient_id or None,
+                "study_id": study_id or None,
+                "audio_sha256": hashlib.sha256(audio.getvalue()).hexdigest() if audio is not None else None,
+            }
+            try:
+                response = requests.post(f"{BACKEND_URL}/reports", json=report)
+                if response.status_code == 201:
+                    st.success(f"✅ Report #{response.json()['id']} submitted successfully!")
+                else:
+                    st.error(f"❌ Failed to save the report: {response.text}")
+            except Exception as e:
+                st.error(f"🚫 Error: {e}")
         else:
             st.warning("Please enter a report before submitting.")
 
+    with st.expander("🔎 Past Reports"):
+        search_text = st.text_input("Search report text", key="report_search")
+        search_patient = st.text_input("Filter by Patient ID", key="report_search_patient")
+        if search_text or search_patient:
+            try:
+                params = {"q": search_text or None, "patient_id": search_patient or None, "limit": 20}
+                page = requests.get(f"{BACKEND_URL}/reports", params=params).json()
+                st.caption(f"{page['total']} report(s) found")
+                for item in page["items"]:
+                    st.markdown(f"**#{item['id']}** · {item['report_date']} {item['report_time'] or ''} · "
+                                f"Patient {item['patient_id'] or '-'} · Study {item['study_id'] or '-'}")
+                    st.text(item["snippet"])
+            except Exception as e:
+                st.error(f"🚫 Error: {e}")
+
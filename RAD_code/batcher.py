@@ -0,0 +1,178 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from model_registry import registry, DEFAULT_MODEL, DEFAULT_DEVICE
+from whisper_backends import WHISPER_BACKEND
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Decode 30 s windows from concurrent requests together instead of one request at a time
+# Batching drives the PyTorch decoder directly, so it is only available with the openai-whisper backend
+BATCHING_ENABLED = os.getenv("WHISPER_BATCHING", "0") == "1" and WHISPER_BACKEND == "openai-whisper"
+BATCH_MAX_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+# How long the first window of a batch waits for others to join
+BATCH_WAIT_MS = float(os.getenv("WHISPER_BATCH_WAIT_MS", "50"))
+# Windows one request may place in a single batch, so long recordings cannot starve short ones
+BATCH_MAX_PER_REQUEST = int(os.getenv("WHISPER_BATCH_MAX_PER_REQUEST", "4"))
+# Batches decoded concurrently, each on its own model replica
+BATCH_WORKERS = int(os.getenv("WHISPER_BATCH_WORKERS", "1"))
+
+# Whisper's own thresholds for treating a window as silence
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+
+class WhisperBatcher:
+    """
+    Dynamic micro-batcher for Whisper.
+
+    Callers submit 30 s PCM windows and block on the result. Windows are queued
+    per request; a batch is closed when it is full or when the oldest window has
+    waited BATCH_WAIT_MS, and requests contribute to it round-robin with at most
+    `max_per_request` windows each. The batch goes through the encoder and
+    decoder in one `whisper.decode()` call and each result is routed back to
+    its caller's future.
+    torch and openai-whisper are only imported once the batcher is first used.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, device: str = DEFAULT_DEVICE,
+                 max_batch: int = BATCH_MAX_SIZE, wait_ms: float = BATCH_WAIT_MS,
+                 max_per_request: int = BATCH_MAX_PER_REQUEST, workers: int = BATCH_WORKERS,
+                 language: str = "en"):
+        self.model_name = model_name
+        self.device = device
+        self.max_batch = max(1, max_batch)
+        self.wait_seconds = wait_ms / 1000
+        self.max_per_request = max(1, max_per_request)
+        self.workers = max(1, workers)
+        self.language = language
+        self.options = None
+        self._queues = OrderedDict()
+        self._oldest = None
+        self._request_ids = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._n_mels = None
+        self.batches = 0
+        self.windows = 0
+
+    def _ensure_started(self):
+        with self._cond:
+            if self._threads:
+                return
+            import whisper
+
+            self.options = whisper.DecodingOptions(language=self.language, without_timestamps=True,
+                                                   fp16=self.device != "cpu")
+            if registry.max_replicas < self.workers:
+                registry.max_replicas = self.workers
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._loop, name=f"whisper-batcher-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _mel(self, audio: np.ndarray):
+        import whisper
+
+        if self._n_mels is None:
+            with registry.acquire(self.model_name, self.device) as engine:
+                self._n_mels = engine.model.dims.n_mels
+        return whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=self._n_mels)
+
+    def transcribe(self, windows):
+        """Transcribe PCM windows of at most 30 s each and return their texts in order."""
+        if not windows:
+            return []
+        self._ensure_started()
+        request_id = next(self._request_ids)
+        # Mel spectrograms are computed on the caller's thread so the batch loop only runs the model
+        futures = []
+        items = []
+        for audio in windows:
+            future = Future()
+            futures.append(future)
+            items.append((self._mel(audio), future))
+
+        with self._cond:
+            self._queues[request_id] = deque(items)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._cond.notify_all()
+        return [future.result() for future in futures]
+
+    def _pending(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _take_batch(self):
+        batch = []
+        while len(batch) < self.max_batch and self._queues:
+            for request_id in list(self._queues):
+                queue = self._queues[request_id]
+                for _ in range(min(self.max_per_request, self.max_batch - len(batch))):
+                    if not queue:
+                        break
+                    batch.append(queue.popleft())
+                if not queue:
+                    del self._queues[request_id]
+                else:
+                    # Served requests go to the back so the next batch starts with someone else
+                    self._queues.move_to_end(request_id)
+                if len(batch) >= self.max_batch:
+                    break
+        self._oldest = time.monotonic() if self._queues else None
+        return batch
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._queues:
+                    self._cond.wait()
+                deadline = self._oldest + self.wait_seconds
+                while self._pending() < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take_batch()
+            if batch:
+                self._run(batch)
+
+    def _run(self, batch):
+        import torch
+        import whisper
+
+        mels = torch.stack([mel for mel, _ in batch])
+        try:
+            with registry.acquire(self.model_name, self.device) as engine, span("batch_decode"):
+                results = whisper.decode(engine.model, mels.to(engine.model.device), self.options)
+        except Exception as e:
+            logger.error(f"Batched decode of {len(batch)} window(s) failed: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.windows += len(batch)
+        for (_, future), result in zip(batch, results):
+            silent = result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD
+            future.set_result("" if silent else result.text.strip())
+
+    def stats(self):
+        with self._cond:
+            queued = self._pending()
+        return {
+            "batches": self.batches,
+            "windows": self.windows,
+            "mean_batch_size": round(self.windows / self.batches, 2) if self.batches else 0.0,
+            "queued_windows": queued,
+        }
+
+
+batcher = WhisperBatcher()
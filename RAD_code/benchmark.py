@@ -0,0 +1,305 @@
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # Windows: peak RSS is not reported for the in-process suites
+    resource = None
+
+# Measure the pipeline itself, not the result cache
+os.environ.setdefault("TRANSCRIBE_CACHE", "0")
+
+SAMPLE_RATE = 16000
+# How often the endpoint suite reads the server's RSS from /metrics
+RSS_SAMPLE_SECONDS = 0.5
+DEFAULT_LENGTHS = (5, 30, 120)
+DEFAULT_CLIENTS = (1, 4)
+SUITES = ("audio", "transcribe", "nlp", "endpoint")
+# Settings recorded with every run so results can be compared like for like
+CONFIG_VARIABLES = (
+    "WHISPER_MODEL", "WHISPER_DEVICE", "WHISPER_BACKEND", "WHISPER_COMPUTE_TYPE", "WHISPER_CPU_THREADS",
+    "TRANSCRIBE_WORKER_MODE", "TRANSCRIBE_WORKERS", "VAD_ENABLED", "WHISPER_BATCHING", "WHISPER_BATCH_SIZE",
+    "TRANSCRIBE_CACHE",
+)
+
+SAMPLE_REPORT = """\
+Chest X-ray PA and lateral views.
+The trachea is central. No mediastinal shift is seen.
+The cardiothoracic ratio is within normal limits.
+Both lung fields are clear. No focal consolidation, pleural effusion or pneumothorax.
+Both hila are normal. The costophrenic angles are clear.
+Both domes of the diaphragm are normal in position and contour.
+Surgical clips are noted in the right axilla.
+Impression: no acute cardiopulmonary abnormality. Clinical correlation is advised.
+"""
+
+
+def synth_audio(seconds: float, seed: int = 0) -> np.ndarray:
+    """
+    Speech-like test signal: voiced bursts (a 120-220 Hz fundamental with harmonics,
+    modulated at a syllable rate) separated by pauses, over a faint noise floor.
+    The same length and seed always give the same samples.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE)
+    audio = rng.normal(0, 10 ** (-60 / 20), n).astype(np.float32)
+    position = 0
+    while position < n:
+        burst = int(rng.uniform(1.0, 4.0) * SAMPLE_RATE)
+        t = np.arange(min(burst, n - position)) / SAMPLE_RATE
+        f0 = rng.uniform(120, 220)
+        voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+        envelope = 0.5 * (1 - np.cos(2 * np.pi * 4 * t))
+        audio[position:position + len(t)] += (0.1 * voice * envelope).astype(np.float32)
+        position += burst + int(rng.uniform(0.3, 1.5) * SAMPLE_RATE)
+    return np.clip(audio, -1, 1)
+
+
+def wav_bytes(audio: np.ndarray) -> bytes:
+    """Encode float PCM as a 16-bit mono WAV file, as a client would upload it."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((audio * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its finished children (FFmpeg) in MB, None if unknown."""
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(max(own, children) / scale, 1)
+
+
+def summarize(name: str, latencies, audio_seconds: float = None, **extra):
+    latencies = np.asarray(latencies)
+    result = {
+        "name": name,
+        "iterations": len(latencies),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+        "mean_ms": round(float(latencies.mean()) * 1000, 2),
+    }
+    if audio_seconds:
+        result["audio_seconds"] = audio_seconds
+        # Processing time per second of audio; below 1 is faster than real time
+        result["rtf"] = round(float(np.percentile(latencies, 50)) / audio_seconds, 4)
+    result.update(extra)
+    if "peak_rss_mb" not in result:
+        result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def server_rss_mb(session, url: str):
+    """The backend's resident memory from its /metrics endpoint in MB, None if unavailable."""
+    try:
+        response = session.get(f"{url}/metrics", timeout=5)
+    except Exception:
+        return None
+    if not response.ok:
+        return None
+    for line in response.text.splitlines():
+        if line.startswith("process_resident_memory_bytes "):
+            return round(float(line.split()[1]) / 2 ** 20, 1)
+    return None
+
+
+class ServerRssSampler:
+    """Polls the backend's RSS while a load runs and keeps the highest value seen."""
+
+    def __init__(self, url: str, interval: float = RSS_SAMPLE_SECONDS):
+        self.url = url
+        self.interval = interval
+        self.peak = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+
+    def _loop(self):
+        import requests
+
+        with requests.Session() as session:
+            while True:
+                rss = server_rss_mb(session, self.url)
+                if rss is not None and (self.peak is None or rss > self.peak):
+                    self.peak = rss
+                if self._stopped.wait(self.interval):
+                    return
+
+
+def measure(fn, iterations: int, warmup: int = 1):
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_audio(lengths, iterations: int):
+    from transcribe import preprocess_audio
+
+    results = []
+    for seconds in lengths:
+        data = wav_bytes(synth_audio(seconds))
+        latencies = measure(lambda: preprocess_audio(data), iterations)
+        results.append(summarize(f"preprocess_audio/{seconds:g}s", latencies, seconds))
+    return results
+
+
+def bench_transcribe(lengths, iterations: int):
+    from transcribe import transcribe_audio
+
+    results = []
+    for seconds in lengths:
+        data = wav_bytes(synth_audio(seconds))
+        latencies = measure(lambda: transcribe_audio(data), iterations)
+        results.append(summarize(f"transcribe_audio/{seconds:g}s", latencies, seconds))
+    return results
+
+
+def bench_nlp(iterations: int):
+    from textpreprocessing import process_medical_transcription
+
+    if process_medical_transcription(SAMPLE_REPORT) is None:
+        raise SystemExit("spaCy model is not installed, cannot run the nlp suite")
+    results = []
+    for name, text in (("report", SAMPLE_REPORT), ("report_x20", SAMPLE_REPORT * 20)):
+        latencies = measure(lambda: process_medical_transcription(text), iterations)
+        results.append(summarize(f"process_medical_transcription/{name}", latencies, chars=len(text)))
+    return results
+
+
+def bench_endpoint(url: str, seconds: float, clients, requests_per_client: int):
+    import requests
+
+    results = []
+    for concurrency in clients:
+        # Every upload differs slightly so the backend's transcription cache cannot answer it
+        payloads = [wav_bytes(synth_audio(seconds, seed=i)) for i in range(concurrency * requests_per_client)]
+        latencies = []
+        statuses = {}
+        lock = threading.Lock()
+
+        def client(offset):
+            with requests.Session() as session:
+                for data in payloads[offset::concurrency]:
+                    start = time.perf_counter()
+                    response = session.post(f"{url}/transcribe/", files={"file": ("bench.wav", data, "audio/wav")})
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                        if response.ok:
+                            latencies.append(elapsed)
+
+        start = time.perf_counter()
+        with ServerRssSampler(url) as sampler, ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(client, range(concurrency)))
+        wall = time.perf_counter() - start
+
+        if not latencies:
+            raise SystemExit(f"No request to {url}/transcribe/ succeeded: {statuses}")
+        results.append(summarize(
+            f"POST /transcribe/ {seconds:g}s x{concurrency} clients", latencies, seconds,
+            clients=concurrency,
+            throughput_rps=round(len(latencies) / wall, 3),
+            audio_seconds_per_second=round(len(latencies) * seconds / wall, 2),
+            statuses={str(code): count for code, count in sorted(statuses.items())},
+            # The server's memory, not this client's; only the process that answered /metrics
+            peak_rss_mb=sampler.peak,
+        ))
+    return results
+
+
+def compare(results, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    for result in results:
+        before = baseline.get(result["name"])
+        if before:
+            change = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0.0
+            print(f"{result['name']}: p50 {before['p50_ms']} -> {result['p50_ms']} ms ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the transcription and NLP hot paths")
+    parser.add_argument("suites", nargs="*", help=f"Any of {', '.join(SUITES)} (default: all but endpoint)")
+    parser.add_argument("--lengths", default=",".join(map(str, DEFAULT_LENGTHS)),
+                        help="Comma separated fixture lengths in seconds")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--url", default=os.getenv("RADASSIST_BACKEND_URL", "http://127.0.0.1:8000"),
+                        help="Backend for the endpoint suite")
+    parser.add_argument("--clients", default=",".join(map(str, DEFAULT_CLIENTS)),
+                        help="Comma separated concurrent client counts for the endpoint suite")
+    parser.add_argument("--requests-per-client", type=int, default=3)
+    parser.add_argument("--output", default=f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare p50 latencies against")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+    suites = args.suites or ["audio", "transcribe", "nlp"]
+    lengths = [float(x) for x in args.lengths.split(",") if x.strip()]
+    clients = [int(x) for x in args.clients.split(",") if x.strip()]
+
+    results = []
+    if "audio" in suites:
+        results += bench_audio(lengths, args.iterations)
+    if "transcribe" in suites:
+        results += bench_transcribe(lengths, args.iterations)
+    if "nlp" in suites:
+        results += bench_nlp(args.iterations)
+    if "endpoint" in suites:
+        results += bench_endpoint(args.url, lengths[0], clients, args.requests_per_client)
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {name: os.environ[name] for name in CONFIG_VARIABLES if name in os.environ},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for result in results:
+        rtf = f", RTF {result['rtf']}" if "rtf" in result else ""
+        rss = f", peak RSS {result['peak_rss_mb']} MB" if result["peak_rss_mb"] is not None else ""
+        print(f"{result['name']}: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms{rtf}{rss}")
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("TRANSCRIBE_CACHE", "1") == "1"
+CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIBE_CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = float(os.getenv("TRANSCRIBE_CACHE_TTL_SECONDS", "86400"))
+# SQLite file for the on-disk tier; empty keeps the cache in memory only
+CACHE_DB_PATH = os.getenv("TRANSCRIBE_CACHE_DB", "")
+CACHE_DB_MAX_ENTRIES = int(os.getenv("TRANSCRIBE_CACHE_DB_MAX_ENTRIES", "100000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcriptions (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcriptions_accessed ON transcriptions (accessed_at);
+"""
+
+
+def cache_key(audio, model_name: str, language: str, **options) -> str:
+    """
+    Content address of a transcription: a hash of the audio (raw upload bytes
+    or decoded PCM) combined with every setting that can change the text.
+    """
+    digest = hashlib.sha256()
+    if isinstance(audio, np.ndarray):
+        digest.update(b"pcm:")
+        digest.update(np.ascontiguousarray(audio).tobytes())
+    elif isinstance(audio, (bytes, bytearray, memoryview)):
+        digest.update(b"raw:")
+        digest.update(audio)
+    else:
+        digest.update(b"raw:")
+        with open(audio, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    settings = {"model": model_name, "language": language, "options": options}
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """Two-tier result cache: an in-memory LRU in front of an optional SQLite store."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: float = CACHE_TTL_SECONDS,
+                 db_path: str = CACHE_DB_PATH, db_max_entries: int = CACHE_DB_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.db_max_entries = db_max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counts["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        if self.db_path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM transcriptions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] + self.ttl_seconds > now:
+                    conn.execute("UPDATE transcriptions SET accessed_at = ? WHERE key = ?", (now, key))
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1] + self.ttl_seconds)
+                    with self._lock:
+                        self._counts["disk_hits"] += 1
+                    return value
+
+        with self._lock:
+            self._counts["misses"] += 1
+        return None
+
+    def put(self, key: str, value):
+        now = time.time()
+        self._remember(key, value, now + self.ttl_seconds)
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO transcriptions (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now),
+                )
+                self._trim_disk(conn, now)
+
+    def _remember(self, key: str, value, expires_at: float):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._counts["evictions"] += 1
+
+    def _trim_disk(self, conn, now: float):
+        expired = conn.execute(
+            "DELETE FROM transcriptions WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        overflow = conn.execute(
+            "DELETE FROM transcriptions WHERE key IN ("
+            "SELECT key FROM transcriptions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.db_max_entries,),
+        ).rowcount
+        if expired or overflow:
+            with self._lock:
+                self._counts["evictions"] += expired + overflow
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM transcriptions")
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._memory)
+        lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+        hits = counts["memory_hits"] + counts["disk_hits"]
+        return {
+            **counts,
+            "memory_entries": entries,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+transcription_cache = TranscriptionCache()
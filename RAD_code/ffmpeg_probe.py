@@ -0,0 +1,92 @@
+import logging
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import FrozenSet, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FFmpegCapabilities:
+    """What the local FFmpeg binary can do, as found by the last probe."""
+
+    available: bool
+    path: Optional[str] = None
+    version: Optional[str] = None
+    audio_decoders: FrozenSet[str] = field(default_factory=frozenset)
+    probed_at: float = 0.0
+
+    def supports(self, codec: str) -> bool:
+        return codec in self.audio_decoders
+
+    def as_dict(self):
+        return {
+            "available": self.available,
+            "path": self.path,
+            "version": self.version,
+            "audio_decoders": sorted(self.audio_decoders),
+            "probed_at": self.probed_at,
+        }
+
+
+_lock = threading.Lock()
+_capabilities: Optional[FFmpegCapabilities] = None
+
+
+def _parse_audio_decoders(output: str) -> FrozenSet[str]:
+    # Lines look like " A....D aac    AAC (Advanced Audio Coding)" after a "------" separator
+    decoders = set()
+    listing = output.split("------", 1)[-1]
+    for line in listing.splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].startswith("A"):
+            decoders.add(parts[1])
+    return frozenset(decoders)
+
+
+def _probe() -> FFmpegCapabilities:
+    path = shutil.which("ffmpeg")
+    if path is None:
+        logger.warning("FFmpeg is not installed or not in PATH")
+        return FFmpegCapabilities(available=False, probed_at=time.time())
+    try:
+        version_output = subprocess.run(
+            [path, "-hide_banner", "-version"], capture_output=True, text=True, check=True
+        ).stdout
+        decoders_output = subprocess.run(
+            [path, "-hide_banner", "-decoders"], capture_output=True, text=True, check=True
+        ).stdout
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.warning(f"FFmpeg at {path} could not be run: {e}")
+        return FFmpegCapabilities(available=False, path=path, probed_at=time.time())
+
+    first_line = version_output.splitlines()[0] if version_output else ""
+    version = first_line.split()[2] if first_line.startswith("ffmpeg version") else None
+    capabilities = FFmpegCapabilities(
+        available=True,
+        path=path,
+        version=version,
+        audio_decoders=_parse_audio_decoders(decoders_output),
+        probed_at=time.time(),
+    )
+    logger.info(f"FFmpeg {version} found at {path} with {len(capabilities.audio_decoders)} audio decoders")
+    return capabilities
+
+
+def probe_ffmpeg(refresh: bool = False) -> FFmpegCapabilities:
+    """Return the cached FFmpeg capabilities, probing the binary only on first use or when `refresh` is set."""
+    global _capabilities
+    if _capabilities is not None and not refresh:
+        return _capabilities
+    with _lock:
+        if _capabilities is None or refresh:
+            _capabilities = _probe()
+        return _capabilities
+
+
+def refresh_ffmpeg_probe() -> FFmpegCapabilities:
+    """Probe FFmpeg again, e.g. after it was installed or upgraded on the host."""
+    return probe_ffmpeg(refresh=True)
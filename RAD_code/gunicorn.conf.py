@@ -0,0 +1,41 @@
+# Production server: gunicorn loads the app and the models once in the master process, then
+# forks the workers, which share the model weights copy-on-write.
+#   gunicorn -c gunicorn.conf.py main:app        (or: python serve.py --workers 4)
+import gc
+import os
+
+bind = os.getenv("RADASSIST_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("RADASSIST_PRELOAD", "1") == "1"
+# Workers that start without preloaded models still have to load them before answering
+timeout = 120
+graceful_timeout = 30
+# Recycle workers now and then; with preloading a replacement starts in well under a second
+max_requests = int(os.getenv("RADASSIST_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+# Each forked worker runs one transcription at a time on its share of the cores, instead of
+# every worker sizing its pool and thread count for the whole machine (serve.py does the same
+# for its uvicorn fallback). Workers share the job queue through leases, see jobs.py.
+os.environ.setdefault("TRANSCRIBE_WORKERS", "1")
+os.environ.setdefault("WHISPER_CPU_THREADS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+
+    import torch
+    import main
+    from whisper_backends import WHISPER_BACKEND
+
+    # CTranslate2 starts its own threads on load, which do not survive a fork
+    if WHISPER_BACKEND == "openai-whisper" and main.executor.mode == "thread":
+        # Load on one thread so no OpenMP pool exists yet; each worker sizes its own after the fork
+        torch.set_num_threads(1)
+        main.registry.warm_up()
+    main.nlp_api.load_pipeline()
+    # Keep the garbage collector from writing to (and so un-sharing) everything loaded so far
+    gc.freeze()
+    server.log.info("Models preloaded, forking workers")
@@ -0,0 +1,304 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from logging_setup import request_id
+from transcribe import lookup_transcription, store_transcription, transcribe_audio
+from workers import QueueFullError
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB_PATH = os.getenv("TRANSCRIBE_JOBS_DB", "jobs.db")
+# Jobs waiting in the queue before new submissions are rejected
+MAX_QUEUED_JOBS = int(os.getenv("TRANSCRIBE_MAX_QUEUED_JOBS", "100"))
+# Finished jobs are purged at startup once they are older than this
+JOB_RETENTION_HOURS = float(os.getenv("TRANSCRIBE_JOB_RETENTION_HOURS", "24"))
+# A running job whose runner has not renewed its claim for this long (the process died or was
+# recycled) goes back to the queue, whichever server process notices first
+JOB_LEASE_SECONDS = float(os.getenv("TRANSCRIBE_JOB_LEASE_SECONDS", "60"))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    filename TEXT,
+    audio BLOB,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    processed_seconds REAL NOT NULL DEFAULT 0,
+    duration_seconds REAL,
+    result TEXT,
+    error TEXT,
+    claimed_by TEXT,
+    heartbeat_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+# Columns added after the first release, with their definitions
+_MIGRATIONS = (("stage", "TEXT"), ("claimed_by", "TEXT"), ("heartbeat_at", "REAL"))
+
+
+class JobStore:
+    """SQLite-backed transcription queue that survives backend restarts."""
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Databases created by earlier versions
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in _MIGRATIONS:
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, filename: str, audio: bytes, result: str = None) -> str:
+        """Queue a job, or record it as already completed when `result` is known (a cache hit)."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        if result is None:
+            status, progress = QUEUED, 0.0
+        else:
+            status, progress, audio = COMPLETED, 1.0, None
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, filename, audio, result, progress, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, status, filename, audio, result, progress, now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, filename, stage, progress, processed_seconds, duration_seconds, result, error, "
+                "created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def count(self, status: str) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def claim_next(self, owner: str):
+        """Atomically move the oldest queued job to running, leased to `owner`, and return its id."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, claimed_by = ?, heartbeat_at = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, owner, now, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        return row["id"]
+
+    def release(self, job_id: str, owner: str):
+        """Put a claimed job back in the queue."""
+        self._update(job_id, owner, status=QUEUED, claimed_by=None, heartbeat_at=None)
+
+    def heartbeat(self, job_ids, owner: str):
+        """Renew `owner`'s lease on the jobs it is running."""
+        if not job_ids:
+            return
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND claimed_by = ? AND id IN ({placeholders})",
+                (time.time(), RUNNING, owner, *job_ids),
+            )
+
+    def reclaim_stale(self, lease_seconds: float = JOB_LEASE_SECONDS) -> int:
+        """Return running jobs whose lease was not renewed in time to the queue."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, claimed_by = NULL, heartbeat_at = NULL, stage = NULL, progress = 0, "
+                "processed_seconds = 0, updated_at = ? WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (QUEUED, time.time(), RUNNING, time.time() - lease_seconds),
+            )
+        return cursor.rowcount
+
+    def load_audio(self, job_id: str) -> bytes:
+        with self._connect() as conn:
+            row = conn.execute("SELECT audio FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["audio"] if row else None
+
+    def set_progress(self, job_id: str, owner: str, processed_seconds: float, duration_seconds: float,
+                     stage: str = "transcribe"):
+        """Record how far the current stage ("decode" or "transcribe") has got; progress is per stage."""
+        progress = min(1.0, processed_seconds / duration_seconds) if duration_seconds else 0.0
+        self._update(job_id, owner, stage=stage, progress=progress, processed_seconds=processed_seconds,
+                     duration_seconds=duration_seconds)
+
+    def complete(self, job_id: str, owner: str, text: str):
+        self._update(job_id, owner, status=COMPLETED, result=text, progress=1.0, audio=None)
+
+    def fail(self, job_id: str, owner: str, error: str):
+        self._update(job_id, owner, status=FAILED, error=error, audio=None)
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        cutoff = time.time() - older_than_seconds
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (COMPLETED, FAILED, cutoff)
+            )
+        return cursor.rowcount
+
+    def _update(self, job_id: str, owner: str = None, **fields):
+        """Update a job; with `owner`, only while it still holds the job's lease."""
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        condition = "id = ?" if owner is None else "id = ? AND claimed_by = ?"
+        params = (job_id,) if owner is None else (job_id, owner)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE {condition}", (*fields.values(), *params))
+
+
+def run_job(job_id: str, owner: str, db_path: str = JOBS_DB_PATH):
+    """
+    Transcribe one stored job. Runs on a transcription worker (thread or process).
+    Results are only written while `owner` still holds the job, so a job reclaimed after
+    a lost lease is not overwritten by the run that lost it.
+    Returns the cache key and text, for the runner to cache in the server process.
+    """
+    request_id.set(f"job-{job_id}")
+    store = JobStore(db_path)
+    audio = store.load_audio(job_id)
+    if audio is None:
+        store.fail(job_id, owner, "Job audio is missing")
+        return None, None
+
+    def progress(done, total, stage="transcribe"):
+        store.set_progress(job_id, owner, done, total, stage)
+
+    try:
+        key, text = lookup_transcription(audio)
+        if text is None:
+            text = transcribe_audio(audio, progress_callback=progress, key=key)
+        store.complete(job_id, owner, text)
+        logger.info(f"Transcription job {job_id} completed")
+        return key, text
+    except Exception as e:
+        logger.error(f"Transcription job {job_id} failed: {str(e)}")
+        store.fail(job_id, owner, str(e))
+        return None, None
+
+
+class JobRunner:
+    """Background dispatcher that feeds queued jobs to the transcription executor."""
+
+    def __init__(self, store: JobStore, executor, poll_interval: float = 1.0,
+                 lease_seconds: float = JOB_LEASE_SECONDS):
+        self.store = store
+        self.executor = executor
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.owner = None
+        self._slots = threading.BoundedSemaphore(executor.workers)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._active = set()
+        self._active_lock = threading.Lock()
+        self._last_maintenance = 0.0
+
+    def start(self):
+        # Identifies this runner's leases; several server processes may share one job database.
+        # Set here rather than in __init__ so that gunicorn workers forked after import differ.
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        purged = self.store.purge_finished(JOB_RETENTION_HOURS * 3600)
+        if purged:
+            logger.info(f"Purged {purged} finished transcription job(s)")
+        self._thread = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def submit(self, filename: str, audio: bytes) -> str:
+        if self.store.count(QUEUED) >= MAX_QUEUED_JOBS:
+            raise QueueFullError()
+        job_id = self.store.create(filename, audio)
+        self._wakeup.set()
+        return job_id
+
+    def _maintain(self):
+        """Renew the leases of running jobs and requeue jobs whose runner stopped renewing them."""
+        now = time.monotonic()
+        if now - self._last_maintenance < self.lease_seconds / 4:
+            return
+        self._last_maintenance = now
+        with self._active_lock:
+            active = list(self._active)
+        self.store.heartbeat(active, self.owner)
+        reclaimed = self.store.reclaim_stale(self.lease_seconds)
+        if reclaimed:
+            logger.warning(f"Requeued {reclaimed} transcription job(s) whose runner stopped responding")
+            self._wakeup.set()
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            self._maintain()
+            # Time out now and then while every slot is busy, so leases keep being renewed
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            job_id = self.store.claim_next(self.owner)
+            if job_id is None:
+                self._slots.release()
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            with self._active_lock:
+                self._active.add(job_id)
+            try:
+                future = self.executor.submit(run_job, job_id, self.owner, self.store.path)
+            except QueueFullError:
+                # Interactive requests hold the workers; try again shortly
+                self._finish(job_id)
+                self.store.release(job_id, self.owner)
+                self._stopped.wait(self.poll_interval)
+                continue
+            future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+
+    def _finish(self, job_id: str):
+        with self._active_lock:
+            self._active.discard(job_id)
+        self._slots.release()
+
+    def _on_done(self, job_id: str, future):
+        self._finish(job_id)
+        if future.exception() is not None:
+            # run_job records its own failures; this only happens when the worker itself died
+            logger.error(f"Transcription job {job_id} crashed: {future.exception()}")
+            self.store.fail(job_id, self.owner, str(future.exception()))
+            return
+        store_transcription(*future.result())
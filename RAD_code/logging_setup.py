@@ -0,0 +1,41 @@
+import contextvars
+import logging
+import os
+import sys
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Empty logs to stdout only
+LOG_FILE = os.getenv("LOG_FILE", "backend.log")
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# Set per HTTP request (or per job) so every log line of its work can be correlated
+request_id = contextvars.ContextVar("request_id", default="-")
+
+_configured = False
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+def setup_logging(level: str = LOG_LEVEL, log_file: str = LOG_FILE):
+    """Configure the root logger once per process: stdout plus an optional log file, tagged with request IDs."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in handlers:
+        root.addHandler(handler)
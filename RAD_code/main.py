@@ -1,23 +1,33 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from transcribe import transcribe_audio, check_ffmpeg
-import shutil
-import os
+import json
 import logging
-import sys
+import time
+import uuid
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
+from logging_setup import request_id, setup_logging
+from transcribe import transcribe_audio, transcribe_window, lookup_transcription, store_transcription
+from streaming import transcribe_stream, STREAM_FORMATS
+from model_registry import registry
+from whisper_backends import backend_settings
+from ffmpeg_probe import probe_ffmpeg, refresh_ffmpeg_probe
+from workers import executor, QueueFullError
+from batcher import batcher, BATCHING_ENABLED
+from cache import transcription_cache
+from jobs import JobStore, JobRunner, QUEUED, RUNNING, COMPLETED, FAILED
+from metrics import metrics, span, process_rss_bytes, REQUEST_SECONDS
+import nlp_api
+import reports_api
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),  
-        logging.FileHandler('backend.log')  
-    ]
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+app.state.ready = False
+job_runner = JobRunner(JobStore(), executor)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -25,56 +35,222 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.include_router(nlp_api.router)
+app.include_router(reports_api.router)
+
+
+def _model_samples(field):
+    return [({"model": m["name"], "device": m["device"]}, m[field]) for m in registry.loaded_models()]
+
+
+def _cache_lookups():
+    stats = transcription_cache.stats()
+    return [({"result": "memory_hit"}, stats["memory_hits"]), ({"result": "disk_hit"}, stats["disk_hits"]),
+            ({"result": "miss"}, stats["misses"])]
+
+
+metrics.gauge_callback("radassist_workers_running", "Transcriptions running on a worker",
+                       lambda: executor.stats()["running"])
+metrics.gauge_callback("radassist_workers_queued", "Transcriptions waiting for a free worker",
+                       lambda: executor.stats()["queued"])
+metrics.gauge_callback("radassist_jobs", "Transcription jobs waiting or running",
+                       lambda: [({"status": status}, job_runner.store.count(status)) for status in (QUEUED, RUNNING)])
+metrics.gauge_callback("radassist_batcher_queued_windows", "30 s windows waiting for a batch",
+                       lambda: batcher.stats()["queued_windows"] if BATCHING_ENABLED else 0)
+metrics.gauge_callback("radassist_cache_lookups_total", "Transcription cache lookups by result",
+                       _cache_lookups, type="counter")
+metrics.gauge_callback("radassist_cache_hit_ratio", "Share of transcription cache lookups that hit",
+                       lambda: transcription_cache.stats()["hit_rate"])
+metrics.gauge_callback("radassist_model_instances", "Loaded Whisper model instances",
+                       lambda: _model_samples("instances"))
+metrics.gauge_callback("radassist_model_instances_in_use", "Whisper model instances leased to a transcription",
+                       lambda: _model_samples("in_use"))
+metrics.gauge_callback("radassist_model_memory_bytes", "Memory held by loaded Whisper model instances",
+                       lambda: [(labels, int(mb * 2 ** 20)) for labels, mb in _model_samples("memory_mb")])
+metrics.gauge_callback("process_resident_memory_bytes", "Resident memory of the backend process", process_rss_bytes)
+
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Tag the request's log lines with an ID (taken from X-Request-ID when present) and time it per route."""
+    rid = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+    token = request_id.set(rid)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        # Route templates, not raw paths, keep job IDs out of the label values
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route, status=status)
+        request_id.reset(token)
+    response.headers["X-Request-ID"] = rid
+    return response
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting up FastAPI application...")
-    if not check_ffmpeg():
+    if not refresh_ffmpeg_probe().available:
         logger.error("FFmpeg is not installed or not in PATH. The application may not work correctly.")
         raise RuntimeError("FFmpeg is required but not found. Please install FFmpeg and ensure it's in your PATH.")
+    executor.start()
+    if executor.mode == "thread":
+        registry.warm_up()
+    job_runner.start()
+    nlp_api.load_pipeline()
+    reports_api.open_store()
+    app.state.ready = True
     logger.info("FastAPI application started successfully")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.ready = False
+    job_runner.stop()
+    executor.shutdown()
+
 @app.get("/health")
-async def health_check():
+async def health_check(refresh_ffmpeg: bool = False):
     
     logger.info("Health check requested")
+    # In process mode the models live in the worker processes, which this process cannot inspect
+    loaded_models = registry.loaded_models() if executor.mode == "thread" else None
+    ffmpeg = probe_ffmpeg(refresh=refresh_ffmpeg)
     return {
         "status": "healthy",
-        "ffmpeg_available": check_ffmpeg(),
-        "whisper_model_loaded": True
+        "ffmpeg_available": ffmpeg.available,
+        "ffmpeg": ffmpeg.as_dict(),
+        "whisper_model_loaded": bool(loaded_models) if loaded_models is not None else None,
+        "whisper_models": loaded_models,
+        "whisper_backend": backend_settings(),
+        "workers": executor.stats(),
+        "batching": batcher.stats() if BATCHING_ENABLED else None,
+        "cache": transcription_cache.stats()
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 503 until startup (FFmpeg check, workers, model warm-up) has finished. /health is liveness."""
+    ready = app.state.ready
+    return JSONResponse({"ready": ready, "whisper_models": registry.loaded_models()}, status_code=200 if ready else 503)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of stage latencies, queue depths, cache and model metrics."""
+    return PlainTextResponse(await run_in_threadpool(metrics.render), media_type="text/plain; version=0.0.4")
+
 @app.post("/transcribe/")
 async def transcribe(file: UploadFile = File(...)):
     try:
         logger.info(f"Received file: {file.filename}")
         
-        file_location = f"temp_{file.filename}"
-        logger.info(f"Saving file to: {file_location}")
-        
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        with span("upload"):
+            audio = await file.read()
         
+        # Answer re-uploads from the cache before waiting for (or being refused) a worker
+        key, text = await run_in_threadpool(lookup_transcription, audio)
+        if text is not None:
+            return {"transcription": text}
+
         logger.info("Starting transcription...")
-        text = transcribe_audio(file_location)
+        text = await executor.run(transcribe_audio, audio, key=key)
+        await run_in_threadpool(store_transcription, key, text)
         logger.info("Transcription completed successfully")
         
-     
-        os.remove(file_location)
-        logger.info(f"Removed temporary file: {file_location}")
-        
         return {"transcription": text}
+    except QueueFullError as e:
+        logger.warning("Transcription queue is full, rejecting request")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logger.error(f"Error during transcription: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-if __name__ == "__main__":
-    import uvicorn
-    logger.info("Starting FastAPI server...")
-    uvicorn.run(
-        "main:app",
-        host="127.0.0.1",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
+async def _decode_stream_window(audio, prompt):
+    return await executor.run(transcribe_window, audio, prompt)
+
+@app.websocket("/transcribe/stream")
+async def transcribe_websocket(websocket: WebSocket, format: str = None):
+    """
+    Live transcription over a WebSocket. The client sends binary audio chunks and the
+    text message "end" when done; the server answers with JSON partial/final/done events.
+    """
+    await websocket.accept()
+    if format is not None and format not in STREAM_FORMATS:
+        await websocket.close(code=1008, reason=f"Unsupported stream format: {format}")
+        return
+
+    async def chunks():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                yield message["bytes"]
+            elif message.get("text") == "end":
+                return
+
+    try:
+        async for event in transcribe_stream(chunks(), _decode_stream_window, format):
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("Streaming client disconnected")
+    except QueueFullError as e:
+        logger.warning("Transcription queue is full, closing stream")
+        await websocket.send_json({"type": "error", "detail": str(e), "retry_after": e.retry_after})
+        await websocket.close(code=1013)
+    except Exception as e:
+        logger.error(f"Error during streaming transcription: {str(e)}")
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1011)
+
+@app.post("/transcribe/stream")
+async def transcribe_sse(request: Request, format: str = None):
+    """Live transcription of a chunked upload, answered with Server-Sent Events as segments are decoded."""
+    if format is not None and format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported stream format: {format}")
+
+    async def events():
+        try:
+            async for event in transcribe_stream(request.stream(), _decode_stream_window, format):
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            logger.error(f"Error during streaming transcription: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/transcribe/jobs", status_code=202)
+async def submit_transcription_job(file: UploadFile = File(...)):
+    logger.info(f"Received transcription job for file: {file.filename}")
+    with span("upload"):
+        audio = await file.read()
+    _, text = await run_in_threadpool(lookup_transcription, audio)
+    if text is not None:
+        job_id = await run_in_threadpool(job_runner.store.create, file.filename, None, result=text)
+        return {"job_id": job_id, "status": COMPLETED}
+    try:
+        job_id = await run_in_threadpool(job_runner.submit, file.filename, audio)
+    except QueueFullError as e:
+        logger.warning("Transcription job queue is full, rejecting job")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/transcribe/jobs/{job_id}")
+async def get_transcription_job(job_id: str):
+    job = await run_in_threadpool(job_runner.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    response = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "processed_seconds": job["processed_seconds"],
+        "duration_seconds": job["duration_seconds"],
+    }
+    if job["status"] == COMPLETED:
+        response["transcription"] = job["result"]
+    elif job["status"] == FAILED:
+        response["error"] = job["error"]
+    return response
@@ -0,0 +1,230 @@
+import gc
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from whisper_backends import load_engine, WHISPER_BACKEND
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv("WHISPER_MODEL", "small")
+DEFAULT_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+# Comma separated list of model sizes to load at startup
+WARMUP_MODELS = [m.strip() for m in os.getenv("WHISPER_WARMUP_MODELS", DEFAULT_MODEL).split(",") if m.strip()]
+# Idle models are dropped after this many seconds (0 keeps them forever)
+MODEL_IDLE_TTL = float(os.getenv("WHISPER_MODEL_IDLE_TTL", "0"))
+# Idle models are evicted before loading another one when free memory is below this (0 disables)
+MIN_AVAILABLE_MEMORY_MB = float(os.getenv("WHISPER_MIN_AVAILABLE_MB", "0"))
+# How often the idle TTL and the memory floor are also checked between requests
+SWEEP_INTERVAL_SECONDS = float(os.getenv("WHISPER_MODEL_SWEEP_SECONDS", "30"))
+
+
+def available_memory_mb():
+    """Return the memory available to new allocations in MB, or None if unknown."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class _ModelSlot:
+    """Loaded instances of one (model, device) pair."""
+
+    def __init__(self):
+        self.instances = []
+        self.idle = []
+        self.loading = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def in_use(self):
+        return len(self.instances) - len(self.idle)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of Whisper models.
+
+    Each (model, device) pair is loaded once through the configured backend
+    (see whisper_backends) and handed out with `acquire()`.
+    Whisper's decoder installs hooks on the model while it runs, so an instance
+    is leased to one caller at a time; `max_replicas` bounds how many copies of
+    the same model may be loaded to serve concurrent callers.
+    """
+
+    def __init__(self, loader=load_engine, max_replicas: int = 1,
+                 idle_ttl: float = MODEL_IDLE_TTL, min_available_mb: float = MIN_AVAILABLE_MEMORY_MB):
+        self._loader = loader
+        self.max_replicas = max(1, max_replicas)
+        self.idle_ttl = idle_ttl
+        self.min_available_mb = min_available_mb
+        self._slots = {}
+        self._cond = threading.Condition()
+        self._sweeper = None
+        self._sweeper_stopped = threading.Event()
+
+    @contextmanager
+    def acquire(self, name: str = DEFAULT_MODEL, device: str = DEFAULT_DEVICE):
+        """Lease a loaded model, loading it on first use."""
+        key = (name, device)
+        model = self._checkout(key)
+        try:
+            yield model
+        finally:
+            self._checkin(key, model)
+
+    def _checkout(self, key):
+        if self.idle_ttl > 0:
+            self.evict_idle()
+
+        with self._cond:
+            while True:
+                slot = self._slots.setdefault(key, _ModelSlot())
+                if slot.idle:
+                    slot.last_used = time.monotonic()
+                    return slot.idle.pop()
+                if len(slot.instances) + slot.loading < self.max_replicas:
+                    slot.loading += 1
+                    break
+                self._cond.wait()
+
+        self._relieve_memory_pressure(exclude=key)
+        name, device = key
+        logger.info(f"Loading Whisper model '{name}' on {device} with {WHISPER_BACKEND}...")
+        start = time.perf_counter()
+        try:
+            with span("model_load"):
+                model = self._loader(name, device)
+        except Exception:
+            with self._cond:
+                slot.loading -= 1
+                self._cond.notify_all()
+            raise
+        logger.info(f"Whisper model '{name}' loaded in {time.perf_counter() - start:.1f}s")
+
+        with self._cond:
+            slot.loading -= 1
+            slot.instances.append(model)
+            slot.last_used = time.monotonic()
+        return model
+
+    def _checkin(self, key, model):
+        with self._cond:
+            slot = self._slots.get(key)
+            if slot is not None and any(m is model for m in slot.instances):
+                slot.idle.append(model)
+                slot.last_used = time.monotonic()
+            self._cond.notify_all()
+
+    def warm_up(self, names=None, device: str = DEFAULT_DEVICE):
+        """Load the given model sizes (defaults to WHISPER_WARMUP_MODELS) ahead of traffic."""
+        for name in names or WARMUP_MODELS:
+            with self.acquire(name, device):
+                pass
+
+    def evict(self, name: str, device: str = DEFAULT_DEVICE) -> int:
+        """Drop the idle instances of a model. Returns the number of instances released."""
+        with self._cond:
+            released = self._evict_locked((name, device))
+        if released:
+            gc.collect()
+        return released
+
+    def evict_idle(self, max_idle: float = None) -> int:
+        """Drop models that have not been used for `max_idle` seconds."""
+        max_idle = self.idle_ttl if max_idle is None else max_idle
+        now = time.monotonic()
+        released = 0
+        with self._cond:
+            for key, slot in list(self._slots.items()):
+                if slot.idle and now - slot.last_used >= max_idle:
+                    released += self._evict_locked(key)
+        if released:
+            gc.collect()
+        return released
+
+    def start_sweeper(self, interval: float = SWEEP_INTERVAL_SECONDS):
+        """
+        Check the idle TTL and the memory floor every `interval` seconds on a daemon thread,
+        so models are unloaded after traffic stops, not only when the next request arrives.
+        Does nothing when neither limit is set.
+        """
+        if self._sweeper is not None or interval <= 0 or (self.idle_ttl <= 0 and self.min_available_mb <= 0):
+            return
+        self._sweeper_stopped.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,), name="model-sweeper",
+                                         daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._sweeper_stopped.set()
+        self._sweeper = None
+
+    def _sweep_loop(self, interval: float):
+        while not self._sweeper_stopped.wait(interval):
+            try:
+                if self.idle_ttl > 0:
+                    self.evict_idle()
+                self._relieve_memory_pressure()
+            except Exception as e:
+                logger.error(f"Model sweep failed: {str(e)}")
+
+    def _evict_locked(self, key) -> int:
+        slot = self._slots.get(key)
+        if slot is None:
+            return 0
+        released = len(slot.idle)
+        for model in slot.idle:
+            slot.instances = [m for m in slot.instances if m is not model]
+        slot.idle = []
+        if not slot.instances and not slot.loading:
+            del self._slots[key]
+        if released:
+            logger.info(f"Evicted {released} idle instance(s) of Whisper model '{key[0]}' on {key[1]}")
+        return released
+
+    def _relieve_memory_pressure(self, exclude=None):
+        if self.min_available_mb <= 0:
+            return
+        available = available_memory_mb()
+        released = 0
+        while available is not None and available < self.min_available_mb:
+            with self._cond:
+                candidates = sorted(
+                    (slot.last_used, key) for key, slot in self._slots.items()
+                    if slot.idle and key != exclude
+                )
+                if not candidates:
+                    break
+                released += self._evict_locked(candidates[0][1])
+            gc.collect()
+            available = available_memory_mb()
+        if available is not None and available < self.min_available_mb:
+            logger.warning(f"Only {available:.0f} MB available after evicting {released} idle model(s)")
+
+    def loaded_models(self):
+        """Describe the models currently resident in this process."""
+        now = time.monotonic()
+        with self._cond:
+            return [
+                {
+                    "name": name,
+                    "device": device,
+                    "instances": len(slot.instances),
+                    "in_use": slot.in_use,
+                    "memory_mb": round(sum(getattr(m, "memory_bytes", 0) for m in slot.instances) / 2 ** 20, 1),
+                    "idle_seconds": round(now - slot.last_used, 1),
+                }
+                for (name, device), slot in self._slots.items()
+                if slot.instances
+            ]
+
+
+registry = ModelRegistry()
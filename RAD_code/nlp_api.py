@@ -0,0 +1,124 @@
+import json
+import logging
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from textpreprocessing import get_nlp_service, DEFAULT_BATCH_SIZE, FIELDS
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/nlp", tags=["nlp"])
+
+
+class TextRequest(BaseModel):
+    text: str
+    fields: List[str] = list(FIELDS)
+    offsets: bool = False
+    format: str = "records"
+
+
+def load_pipeline():
+    """Load the shared spaCy pipeline ahead of the first request."""
+    try:
+        get_nlp_service()
+        logger.info("spaCy pipeline loaded")
+    except OSError as e:
+        logger.error(f"spaCy model could not be loaded, /nlp routes will fail: {str(e)}")
+
+
+def _service():
+    try:
+        return get_nlp_service()
+    except OSError:
+        raise HTTPException(status_code=503, detail="spaCy model is not installed")
+
+
+async def _ndjson_records(stream):
+    """Yield (line_number, record or error) for each non-empty line of an NDJSON byte stream."""
+    buffer = b""
+    line_number = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, _parse_record(line)
+    if buffer.strip():
+        yield line_number + 1, _parse_record(buffer)
+
+
+def _parse_record(line: bytes):
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {e}")
+    if isinstance(record, str):
+        record = {"text": record}
+    if not isinstance(record, dict) or not isinstance(record.get("text"), str):
+        return ValueError("Each line must be a JSON string or an object with a 'text' field")
+    return record
+
+
+@router.post("/process")
+async def process_text(body: TextRequest):
+    """
+    Process one document. `fields` selects sentences/entities/tokens, `offsets` returns
+    character offsets instead of repeated strings and `format` is records, columnar or docbin.
+    """
+    service = _service()
+    try:
+        return await run_in_threadpool(service.process, body.text, body.fields, body.offsets, body.format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/process/batch")
+async def process_batch(request: Request, batch_size: int = DEFAULT_BATCH_SIZE, fields: str = ",".join(FIELDS),
+                        offsets: bool = False, format: str = "records"):
+    """
+    Process NDJSON input, one `{"id": ..., "text": ...}` object (or bare JSON string) per line,
+    and stream one NDJSON result per input line in the same order.
+    Documents are run through nlp.pipe in batches of `batch_size` as they arrive.
+    `fields` is a comma separated subset of sentences,entities,tokens.
+    """
+    service = _service()
+    batch_size = max(1, batch_size)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    try:
+        service.process_batch([], fields=selected, format=format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def results():
+        pending = []
+
+        async def flush():
+            records = [record for _, record in pending if not isinstance(record, Exception)]
+            processed = await run_in_threadpool(
+                lambda: list(service.process_batch([r["text"] for r in records], batch_size=batch_size,
+                                                   fields=selected, offsets=offsets, format=format))
+            )
+            processed = iter(processed)
+            lines = []
+            for line_number, record in pending:
+                if isinstance(record, Exception):
+                    lines.append(json.dumps({"line": line_number, "error": str(record)}) + "\n")
+                else:
+                    output = {"id": record.get("id", line_number), **next(processed)}
+                    lines.append(json.dumps(output) + "\n")
+            pending.clear()
+            return "".join(lines)
+
+        async for line_number, record in _ndjson_records(request.stream()):
+            pending.append((line_number, record))
+            if len(pending) >= batch_size:
+                yield await flush()
+        if pending:
+            yield await flush()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
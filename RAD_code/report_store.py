@@ -0,0 +1,132 @@
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+REPORTS_DB_PATH = os.getenv("REPORTS_DB", "reports.db")
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+SNIPPET_TOKENS = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    patient_id TEXT,
+    study_id TEXT,
+    report_date TEXT NOT NULL,
+    report_time TEXT,
+    report_text TEXT NOT NULL,
+    transcript TEXT NOT NULL DEFAULT '',
+    audio_sha256 TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_date ON reports (report_date, report_time);
+CREATE INDEX IF NOT EXISTS reports_patient ON reports (patient_id, report_date);
+CREATE INDEX IF NOT EXISTS reports_study ON reports (study_id);
+CREATE INDEX IF NOT EXISTS reports_audio ON reports (audio_sha256);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+    report_text, transcript, content='reports', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS reports_ai AFTER INSERT ON reports BEGIN
+    INSERT INTO reports_fts (rowid, report_text, transcript) VALUES (new.id, new.report_text, new.transcript);
+END;
+CREATE TRIGGER IF NOT EXISTS reports_ad AFTER DELETE ON reports BEGIN
+    INSERT INTO reports_fts (reports_fts, rowid, report_text, transcript)
+    VALUES ('delete', old.id, old.report_text, old.transcript);
+END;
+CREATE TRIGGER IF NOT EXISTS reports_au AFTER UPDATE ON reports BEGIN
+    INSERT INTO reports_fts (reports_fts, rowid, report_text, transcript)
+    VALUES ('delete', old.id, old.report_text, old.transcript);
+    INSERT INTO reports_fts (rowid, report_text, transcript) VALUES (new.id, new.report_text, new.transcript);
+END;
+"""
+
+_SUMMARY_COLUMNS = "r.id, r.patient_id, r.study_id, r.report_date, r.report_time, r.audio_sha256, r.created_at"
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _match_expression(query: str):
+    """
+    Turn free text into an FTS5 query: every word must appear, as a prefix, so typing
+    "pleur eff" finds "pleural effusion". FTS5 operators in the input are treated as words.
+    """
+    words = _WORD.findall(query)
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+class ReportStore:
+    """SQLite store for finalized reports with full-text search over report and transcript."""
+
+    def __init__(self, path: str = REPORTS_DB_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, report_text: str, report_date: str, report_time: str = None, transcript: str = "",
+               patient_id: str = None, study_id: str = None, audio_sha256: str = None) -> int:
+        """Store a report and return its id. Dates and times are ISO strings (YYYY-MM-DD, HH:MM[:SS])."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO reports (patient_id, study_id, report_date, report_time, report_text, transcript, "
+                "audio_sha256, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (patient_id, study_id, report_date, report_time, report_text, transcript or "",
+                 audio_sha256, time.time()),
+            )
+        return cursor.lastrowid
+
+    def get(self, report_id: int):
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {_SUMMARY_COLUMNS}, r.report_text, r.transcript FROM reports r WHERE r.id = ?",
+                (report_id,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def search(self, query: str = None, patient_id: str = None, study_id: str = None, date_from: str = None,
+               date_to: str = None, limit: int = DEFAULT_PAGE_SIZE, offset: int = 0):
+        """
+        List reports, newest first, or by relevance when `query` is given. Filters combine with AND.
+        Returns {"total", "limit", "offset", "items"}; each item carries a text snippet.
+        """
+        limit = min(max(1, limit), MAX_PAGE_SIZE)
+        offset = max(0, offset)
+        conditions = []
+        params = []
+        match = _match_expression(query) if query else None
+        if match:
+            source = "reports_fts JOIN reports r ON r.id = reports_fts.rowid"
+            conditions.append("reports_fts MATCH ?")
+            params.append(match)
+            snippet = f"snippet(reports_fts, -1, '[', ']', '...', {SNIPPET_TOKENS})"
+            order = "bm25(reports_fts), r.report_date DESC, r.id DESC"
+        else:
+            source = "reports r"
+            snippet = "substr(r.report_text, 1, 200)"
+            order = "r.report_date DESC, r.report_time DESC, r.id DESC"
+        for column, value in (("r.patient_id = ?", patient_id), ("r.study_id = ?", study_id),
+                              ("r.report_date >= ?", date_from), ("r.report_date <= ?", date_to)):
+            if value:
+                conditions.append(column)
+                params.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM {source}{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {_SUMMARY_COLUMNS}, {snippet} AS snippet FROM {source}{where} "
+                f"ORDER BY {order} LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return {"total": total, "limit": limit, "offset": offset, "items": [dict(row) for row in rows]}
@@ -0,0 +1,78 @@
+import logging
+from datetime import date, time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from report_store import ReportStore, DEFAULT_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+store = None
+
+
+class ReportRequest(BaseModel):
+    report_text: str
+    report_date: date
+    report_time: Optional[time] = None
+    transcript: str = ""
+    patient_id: Optional[str] = None
+    study_id: Optional[str] = None
+    audio_sha256: Optional[str] = None
+
+
+def open_store():
+    """Open (and create if needed) the report database ahead of the first request."""
+    global store
+    store = ReportStore()
+    logger.info(f"Report store opened at {store.path}")
+
+
+def _store():
+    if store is None:
+        raise HTTPException(status_code=503, detail="Report store is not available")
+    return store
+
+
+@router.post("", status_code=201)
+async def create_report(body: ReportRequest):
+    if not body.report_text.strip():
+        raise HTTPException(status_code=400, detail="report_text must not be empty")
+    report_id = await run_in_threadpool(
+        _store().create,
+        body.report_text,
+        body.report_date.isoformat(),
+        body.report_time.isoformat(timespec="seconds") if body.report_time else None,
+        body.transcript,
+        body.patient_id or None,
+        body.study_id or None,
+        body.audio_sha256,
+    )
+    logger.info(f"Stored report {report_id}")
+    return {"id": report_id}
+
+
+@router.get("")
+async def list_reports(q: str = None, patient_id: str = None, study_id: str = None, date_from: date = None,
+                       date_to: date = None, limit: int = DEFAULT_PAGE_SIZE, offset: int = 0):
+    """
+    Page through reports, newest first. `q` searches report and transcript text (every word
+    must match, as a prefix) and orders by relevance; the other parameters filter.
+    """
+    return await run_in_threadpool(
+        _store().search, q, patient_id, study_id,
+        date_from.isoformat() if date_from else None,
+        date_to.isoformat() if date_to else None,
+        limit, offset,
+    )
+
+
+@router.get("/{report_id}")
+async def get_report(report_id: int):
+    report = await run_in_threadpool(_store().get, report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Unknown report: {report_id}")
+    return report
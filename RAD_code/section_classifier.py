@@ -0,0 +1,106 @@
+import sys
+import threading
+
+import spacy
+from spacy.language import Language
+from spacy.matcher import PhraseMatcher
+
+DEFAULT_BATCH_SIZE = 256
+
+# Checked in this order; a sentence goes to the first section whose vocabulary it mentions.
+# Phrases match whole tokens, so every inflection that should count is listed: the notebook's
+# substring test matched "suggests" through "suggest", but also "review" through "view".
+SECTION_KEYWORDS = {
+    "Techniques": ["view", "views", "viewed"],
+    "Findings": [
+        "clear", "clearly", "normal", "normally", "shift", "shifted", "opacity", "opacities", "hila", "hilar",
+        "hilum", "diaphragm", "diaphragms", "diaphragmatic", "ratio", "ratios", "clip", "clips",
+        "costophrenic angle", "costophrenic angles",
+    ],
+    "Inference": [
+        "advice", "advise", "advised", "advises", "recommend", "recommends", "recommended", "recommending",
+        "recommendation", "recommendations", "impression", "impressions", "suggest", "suggests", "suggested",
+        "suggesting", "suggestive", "clinical correlation",
+    ],
+}
+
+
+@Language.component("line_boundaries")
+def line_boundaries(doc):
+    """Dictated reports often end a line without punctuation; treat every line break as a sentence boundary."""
+    for token in doc[:-1]:
+        if "\n" in token.text or "\n" in token.whitespace_:
+            doc[token.i + 1].is_sent_start = True
+    return doc
+
+
+class SectionClassifier:
+    """
+    Rule-based radiology section tagger.
+
+    All section vocabularies are compiled into one PhraseMatcher automaton over
+    lower-cased tokens, so tagging a report is a single linear pass over its
+    tokens. Sentences come from a rule-based sentencizer plus line breaks, so no
+    statistical model has to run first.
+    """
+
+    def __init__(self, keywords=None):
+        self.keywords = keywords or SECTION_KEYWORDS
+        self.sections = list(self.keywords)
+        self.nlp = spacy.blank("en")
+        self.nlp.add_pipe("sentencizer")
+        self.nlp.add_pipe("line_boundaries")
+        self.matcher = PhraseMatcher(self.nlp.vocab, attr="LOWER")
+        for section, phrases in self.keywords.items():
+            self.matcher.add(section, list(self.nlp.tokenizer.pipe(phrases)))
+        self._priority = {self.nlp.vocab.strings[section]: i for i, section in enumerate(self.sections)}
+
+    def _categorize(self, doc):
+        # Best (lowest) section priority matched inside each sentence, keyed by sentence start token
+        best = {}
+        for match_id, start, _ in self.matcher(doc):
+            sent_start = doc[start].sent.start
+            priority = self._priority[match_id]
+            if priority < best.get(sent_start, len(self.sections)):
+                best[sent_start] = priority
+
+        categories = {section: [] for section in self.sections}
+        for sent in doc.sents:
+            if sent.start in best:
+                text = sent.text.strip()
+                if text:
+                    categories[self.sections[best[sent.start]]].append(text)
+        return categories
+
+    def categorize(self, report: str):
+        """Split a report into {"Techniques": [...], "Findings": [...], "Inference": [...]} sentences."""
+        return self._categorize(self.nlp(report))
+
+    def categorize_batch(self, reports, batch_size: int = DEFAULT_BATCH_SIZE):
+        """Lazily categorize many reports, yielding results in input order."""
+        return (self._categorize(doc) for doc in self.nlp.pipe(reports, batch_size=batch_size))
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_section_classifier():
+    """Return the process-wide SectionClassifier, compiling the matcher on first use."""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = SectionClassifier()
+        return _classifier
+
+
+def categorize_sentences(report):
+    return get_section_classifier().categorize(report)
+
+
+if __name__ == "__main__":
+    text = open(sys.argv[1]).read() if len(sys.argv) > 1 else sys.stdin.read()
+    for category, sentences in categorize_sentences(text).items():
+        print(f"\n{category}:")
+        for sentence in sentences:
+            print(f"- {sentence}")
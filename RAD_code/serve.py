@@ -0,0 +1,54 @@
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+
+from logging_setup import setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def serve():
+    """
+    Command line entry point. It never imports `main`: the server processes (gunicorn or
+    uvicorn workers) import it themselves and load the models there.
+    """
+    parser = argparse.ArgumentParser(description="Run the RAD-Assist backend")
+    parser.add_argument("--host", default=os.getenv("RADASSIST_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("RADASSIST_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Server processes; more than one forks them from a master that preloaded the models")
+    parser.add_argument("--reload", action="store_true", help="Restart on code changes (development only)")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    if args.workers > 1 and not args.reload:
+        # One transcription per server process on its share of the cores, as in gunicorn.conf.py
+        os.environ.setdefault("TRANSCRIBE_WORKERS", "1")
+        os.environ.setdefault("WHISPER_CPU_THREADS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+        if importlib.util.find_spec("gunicorn") is not None:
+            logger.info(f"Starting gunicorn with {args.workers} pre-forked workers...")
+            os.environ["WEB_CONCURRENCY"] = str(args.workers)
+            os.execvp(sys.executable, [
+                sys.executable, "-m", "gunicorn", "--chdir", here, "-c", os.path.join(here, "gunicorn.conf.py"),
+                "--bind", f"{args.host}:{args.port}", "main:app",
+            ])
+        logger.warning("gunicorn is not installed; every uvicorn worker will load its own copy of the models")
+
+    import uvicorn
+    logger.info("Starting FastAPI server...")
+    uvicorn.run(
+        "main:app",
+        app_dir=here,
+        host=args.host,
+        port=args.port,
+        reload=args.reload,
+        workers=None if args.reload else args.workers,
+        log_level="info"
+    )
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import os
+
+import numpy as np
+
+from ffmpeg_probe import probe_ffmpeg
+from transcribe import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Decode again once this much new audio has arrived
+STREAM_STEP_SECONDS = float(os.getenv("STREAM_STEP_SECONDS", "3"))
+# Segments ending inside this tail of the window may still change and stay partial
+STREAM_OVERLAP_SECONDS = float(os.getenv("STREAM_OVERLAP_SECONDS", "2"))
+# Uncommitted audio is force-committed once the window grows past Whisper's 30 s context
+STREAM_MAX_WINDOW_SECONDS = float(os.getenv("STREAM_MAX_WINDOW_SECONDS", "30"))
+# Characters of committed text passed to Whisper as the prompt for the next window
+PROMPT_CHARS = 200
+
+RAW_PCM_FORMAT = "pcm_f32le"
+# Formats a client may name; the value reaches FFmpeg's -f, which also knows devices and filter graphs
+STREAM_FORMATS = frozenset({"webm", "ogg", "wav", "mp3", "matroska", RAW_PCM_FORMAT})
+
+
+class StreamingDecoder:
+    """
+    Long-lived FFmpeg process that turns container audio chunks (webm, ogg, mp3, wav...)
+    into 16kHz mono float32 PCM as they arrive.
+    Clients that already send raw little-endian float32 PCM bypass FFmpeg entirely.
+    """
+
+    def __init__(self, input_format: str = None):
+        if input_format is not None and input_format not in STREAM_FORMATS:
+            raise ValueError(f"Unsupported stream format: {input_format}")
+        self.raw = input_format == RAW_PCM_FORMAT
+        self.input_format = input_format
+        self._process = None
+        self._pcm = bytearray()
+        self._reader = None
+        self._stderr = None
+        self._stderr_tail = b""
+
+    async def start(self):
+        if self.raw:
+            return
+        ffmpeg = probe_ffmpeg()
+        if not ffmpeg.available:
+            raise RuntimeError("FFmpeg is required to decode streamed audio but was not found in PATH")
+        cmd = [ffmpeg.path, '-loglevel', 'error']
+        if self.input_format:
+            cmd += ['-f', self.input_format]
+        cmd += ['-i', 'pipe:0', '-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1']
+        self._process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self._reader = asyncio.create_task(self._read_stdout())
+        self._stderr = asyncio.create_task(self._read_stderr())
+
+    async def _read_stdout(self):
+        while True:
+            chunk = await self._process.stdout.read(65536)
+            if not chunk:
+                break
+            self._pcm.extend(chunk)
+
+    async def _read_stderr(self):
+        while True:
+            chunk = await self._process.stderr.read(4096)
+            if not chunk:
+                break
+            self._stderr_tail = (self._stderr_tail + chunk)[-4096:]
+
+    async def feed(self, chunk: bytes):
+        if self.raw:
+            self._pcm.extend(chunk)
+            return
+        self._process.stdin.write(chunk)
+        await self._process.stdin.drain()
+
+    def read(self) -> np.ndarray:
+        """Return the PCM decoded since the previous call."""
+        usable = len(self._pcm) - len(self._pcm) % 4
+        samples = np.frombuffer(bytes(self._pcm[:usable]), np.float32)
+        del self._pcm[:usable]
+        return samples
+
+    async def close(self) -> np.ndarray:
+        """Flush the decoder and return the remaining PCM."""
+        if self._process is not None:
+            if not self._process.stdin.is_closing():
+                self._process.stdin.close()
+            await asyncio.gather(self._reader, self._stderr)
+            returncode = await self._process.wait()
+            if returncode != 0:
+                logger.error(f"FFmpeg stream decoder exited with {returncode}: "
+                             f"{self._stderr_tail.decode(errors='replace')}")
+        return self.read()
+
+    def abort(self):
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+
+
+class StreamingTranscriber:
+    """
+    Sliding-window state for live transcription.
+
+    Audio accumulates in an uncommitted window. Each decode of the window splits
+    Whisper's segments into final ones, which end before the overlap tail and are
+    never re-decoded, and partial ones, which are decoded again with the next audio.
+    The model call itself is left to the caller so it can run on a worker pool.
+    """
+
+    def __init__(self, step_seconds: float = STREAM_STEP_SECONDS, overlap_seconds: float = STREAM_OVERLAP_SECONDS,
+                 max_window_seconds: float = STREAM_MAX_WINDOW_SECONDS):
+        self.step_samples = int(step_seconds * SAMPLE_RATE)
+        self.overlap_seconds = overlap_seconds
+        self.max_window_seconds = max_window_seconds
+        self._window = np.zeros(0, np.float32)
+        self._window_start = 0.0
+        self._undecoded_samples = 0
+        self._committed = []
+
+    @property
+    def text(self) -> str:
+        return " ".join(self._committed)
+
+    def add_audio(self, pcm: np.ndarray):
+        if len(pcm):
+            self._window = np.concatenate([self._window, pcm])
+            self._undecoded_samples += len(pcm)
+
+    def next_window(self, final: bool = False):
+        """Return (audio, prompt) to decode, or None if not enough new audio has arrived."""
+        if not len(self._window):
+            return None
+        if not final and self._undecoded_samples < self.step_samples:
+            return None
+        self._undecoded_samples = 0
+        prompt = self.text[-PROMPT_CHARS:] or None
+        return self._window, prompt
+
+    def apply(self, segments, final: bool = False):
+        """Turn the segments of the last decoded window into partial/final events."""
+        window_seconds = len(self._window) / SAMPLE_RATE
+        if final:
+            stable = len(segments)
+        else:
+            cutoff = window_seconds - self.overlap_seconds
+            stable = 0
+            while stable < len(segments) and segments[stable]["end"] <= cutoff:
+                stable += 1
+            if stable == 0 and window_seconds >= self.max_window_seconds and segments:
+                # Nothing looks stable but the window is full: commit all but the newest segment
+                stable = max(1, len(segments) - 1)
+
+        offset = self._window_start
+        events = []
+        for segment in segments[:stable]:
+            if segment["text"]:
+                self._committed.append(segment["text"])
+                events.append(self._event("final", segment, offset))
+
+        pending = [s for s in segments[stable:] if s["text"]]
+        if pending and not final:
+            events.append(self._event("partial", {
+                "start": pending[0]["start"],
+                "end": pending[-1]["end"],
+                "text": " ".join(s["text"] for s in pending),
+            }, offset))
+
+        if final:
+            consumed = len(self._window)
+        elif stable:
+            consumed = min(len(self._window), int(segments[stable - 1]["end"] * SAMPLE_RATE))
+        elif window_seconds >= self.max_window_seconds:
+            # Silence or noise only; drop the oldest audio so the window stays bounded
+            consumed = len(self._window) - int(self.overlap_seconds * SAMPLE_RATE)
+        else:
+            consumed = 0
+        self._window = self._window[consumed:]
+        self._window_start += consumed / SAMPLE_RATE
+        return events
+
+    def _event(self, kind, segment, offset):
+        return {
+            "type": kind,
+            "start": round(offset + segment["start"], 2),
+            "end": round(offset + segment["end"], 2),
+            "text": segment["text"],
+        }
+
+
+async def transcribe_stream(chunks, decode_window, input_format: str = None):
+    """
+    Yield partial and final segment events for an async iterator of audio chunks,
+    followed by a "done" event with the full text.
+    `decode_window(audio, prompt)` is awaited to run Whisper on the current window.
+    """
+    decoder = StreamingDecoder(input_format)
+    transcriber = StreamingTranscriber()
+    await decoder.start()
+    try:
+        async for chunk in chunks:
+            await decoder.feed(chunk)
+            transcriber.add_audio(decoder.read())
+            window = transcriber.next_window()
+            if window is not None:
+                for event in transcriber.apply(await decode_window(*window)):
+                    yield event
+
+        transcriber.add_audio(await decoder.close())
+        window = transcriber.next_window(final=True)
+        if window is not None:
+            for event in transcriber.apply(await decode_window(*window), final=True):
+                yield event
+        yield {"type": "done", "text": transcriber.text}
+    finally:
+        decoder.abort()
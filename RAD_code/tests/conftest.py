@@ -0,0 +1,29 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The backend modules are imported flat, the way main.py imports them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_RATE = 16000
+
+
+@pytest.fixture
+def speech_like():
+    """Factory for a deterministic speech-like signal: voiced bursts separated by pauses, over noise."""
+    def make(seconds: float, noise: float = 1e-3, seed: int = 0, pause: tuple = (0.7, 1.5)):
+        rng = np.random.default_rng(seed)
+        n = int(seconds * SAMPLE_RATE)
+        audio = rng.normal(0, noise, n)
+        position = int(0.5 * SAMPLE_RATE)
+        while position < n:
+            burst = int(rng.uniform(1.0, 3.0) * SAMPLE_RATE)
+            t = np.arange(min(burst, n - position)) / SAMPLE_RATE
+            f0 = rng.uniform(120, 220)
+            voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+            audio[position:position + len(t)] += 0.1 * voice
+            position += burst + int(rng.uniform(*pause) * SAMPLE_RATE)
+        return np.clip(audio, -1, 1).astype(np.float32)
+    return make
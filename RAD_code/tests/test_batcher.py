@@ -0,0 +1,78 @@
+from collections import Counter, deque
+
+import numpy as np
+import pytest
+
+pytest.importorskip("batcher")
+from batcher import WhisperBatcher
+
+
+def enqueue(batcher, request_id, count):
+    batcher._queues[request_id] = deque((f"{request_id}{i}", None) for i in range(count))
+
+
+def owners(batch):
+    return Counter(mel[0] for mel, _ in batch)
+
+
+def test_batches_are_capped_per_request():
+    batcher = WhisperBatcher(max_batch=4, max_per_request=2)
+    enqueue(batcher, "a", 10)
+    enqueue(batcher, "b", 1)
+    enqueue(batcher, "c", 3)
+    batch = batcher._take_batch()
+    assert len(batch) == 4
+    assert set(owners(batch)) == {"a", "b", "c"}
+    assert max(owners(batch).values()) <= 2
+
+
+def test_a_long_request_does_not_starve_a_new_one():
+    batcher = WhisperBatcher(max_batch=4, max_per_request=2)
+    enqueue(batcher, "a", 100)
+    assert owners(batcher._take_batch()) == {"a": 4}
+    enqueue(batcher, "b", 2)
+    assert owners(batcher._take_batch()) == {"a": 2, "b": 2}
+
+
+def test_every_window_is_taken_once_in_order():
+    batcher = WhisperBatcher(max_batch=3, max_per_request=1)
+    enqueue(batcher, "a", 5)
+    enqueue(batcher, "b", 4)
+    taken = []
+    while batcher._queues:
+        batch = batcher._take_batch()
+        assert 0 < len(batch) <= 3
+        taken += [mel for mel, _ in batch]
+    assert sorted(taken) == sorted([f"a{i}" for i in range(5)] + [f"b{i}" for i in range(4)])
+    assert [m for m in taken if m[0] == "a"] == [f"a{i}" for i in range(5)]
+    assert batcher._oldest is None
+
+
+
+@pytest.fixture
+def transcribe(monkeypatch):
+    module = pytest.importorskip("transcribe")
+    monkeypatch.setattr(module, "BATCHING_ENABLED", True)
+    monkeypatch.setattr(module, "speech_spans", lambda audio: [(0, 16000)])
+    return module
+
+
+@pytest.fixture
+def calls(transcribe, monkeypatch):
+    calls = []
+    monkeypatch.setattr(transcribe.batcher, "transcribe", lambda windows: calls.append("batcher") or ["batched"])
+    monkeypatch.setattr(transcribe, "transcribe_window", lambda audio, prompt, model_name: calls.append(model_name)
+                        or [{"start": 0.0, "end": 1.0, "text": "windowed"}])
+    return calls
+
+
+def test_the_default_model_is_batched(transcribe, calls):
+    segments = transcribe.transcribe_segments(np.zeros(16000, np.float32), transcribe.batcher.model_name)
+    assert [s["text"] for s in segments] == ["batched"]
+    assert calls == ["batcher"]
+
+
+def test_other_models_are_not_batched(transcribe, calls):
+    segments = transcribe.transcribe_segments(np.zeros(16000, np.float32), "tiny-other")
+    assert [s["text"] for s in segments] == ["windowed"]
+    assert calls == ["tiny-other"]
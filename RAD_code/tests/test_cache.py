@@ -0,0 +1,126 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+import pytest
+
+from cache import TranscriptionCache, cache_key
+
+
+def test_key_covers_audio_and_settings():
+    key = cache_key(b"audio", "small", "en", vad=True)
+    assert key == cache_key(b"audio", "small", "en", vad=True)
+    assert key != cache_key(b"audio!", "small", "en", vad=True)
+    assert key != cache_key(b"audio", "base", "en", vad=True)
+    assert key != cache_key(b"audio", "small", "en", vad=False)
+
+
+def test_key_of_a_file_matches_its_bytes(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"audio")
+    assert cache_key(str(path), "small", "en") == cache_key(b"audio", "small", "en")
+    pcm = np.zeros(16, np.float32)
+    assert cache_key(pcm, "small", "en") != cache_key(pcm.tobytes(), "small", "en")
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = TranscriptionCache(max_entries=2, db_path="")
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire():
+    cache = TranscriptionCache(ttl_seconds=0.05, db_path="")
+    cache.put("a", "A")
+    assert cache.get("a") == "A"
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+
+def test_disk_tier_outlives_the_memory_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+    TranscriptionCache(db_path=path).put("a", "A")
+    cache = TranscriptionCache(db_path=path)
+    assert cache.get("a") == "A"
+    assert cache.get("a") == "A"
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+
+
+def test_disk_tier_is_trimmed(tmp_path):
+    cache = TranscriptionCache(max_entries=1, db_path=str(tmp_path / "cache.db"), db_max_entries=2)
+    for key in "abc":
+        cache.put(key, key.upper())
+        time.sleep(0.01)
+    assert cache.get("a") is None
+    assert cache.get("b") == "B"
+
+
+def test_expired_disk_entries_are_ignored(tmp_path):
+    path = str(tmp_path / "cache.db")
+    TranscriptionCache(ttl_seconds=0.05, db_path=path).put("a", "A")
+    time.sleep(0.1)
+    assert TranscriptionCache(ttl_seconds=0.05, db_path=path).get("a") is None
+
+
+@pytest.fixture
+def transcribe(monkeypatch):
+    module = pytest.importorskip("transcribe")
+    monkeypatch.setattr(module, "CACHE_ENABLED", True)
+    monkeypatch.setattr(module, "transcription_cache", TranscriptionCache(db_path=""))
+    return module
+
+
+def test_lookup_answers_repeated_uploads(transcribe, monkeypatch):
+    monkeypatch.setattr(transcribe, "_transcribe_uncached", lambda *args: "text")
+    key, text = transcribe.lookup_transcription(b"audio")
+    assert text is None
+    assert transcribe.transcribe_audio(b"audio", key=key) == "text"
+    assert transcribe.lookup_transcription(b"audio") == (key, None)
+    transcribe.store_transcription(key, "text")
+    assert transcribe.lookup_transcription(b"audio") == (key, "text")
+
+
+def test_empty_transcriptions_are_not_cached(transcribe, monkeypatch):
+    results = iter(["", "text"])
+    monkeypatch.setattr(transcribe, "_transcribe_uncached", lambda *args: next(results))
+    assert transcribe.transcribe_audio(b"audio") == ""
+    assert transcribe.transcribe_audio(b"audio") == "text"
+    assert transcribe.lookup_transcription(b"audio")[1] == "text"
+
+
+def transcribe_in_worker(audio, key=None):
+    import transcribe
+    transcribe._transcribe_uncached = lambda *args: f"text from {os.getpid()}"
+    return transcribe.transcribe_audio(audio, key=key)
+
+
+def test_process_mode_results_are_cached_by_the_server(transcribe, monkeypatch):
+    workers = pytest.importorskip("workers")
+    # The spawned worker loads no model and, on this backend, does not need torch either
+    monkeypatch.setenv("WHISPER_WARMUP_MODELS", "")
+    monkeypatch.setenv("WHISPER_BACKEND", "ctranslate2")
+    executor = workers.TranscriptionExecutor(mode="process", workers=1, max_queue=1)
+    executor.start()
+
+    async def request():
+        # The /transcribe/ path: look up here, transcribe on a worker, store here
+        key, text = transcribe.lookup_transcription(b"audio")
+        if text is None:
+            text = await executor.run(transcribe_in_worker, b"audio", key=key)
+            transcribe.store_transcription(key, text)
+        return text
+
+    try:
+        first = asyncio.run(request())
+        assert first != f"text from {os.getpid()}"
+        assert asyncio.run(request()) == first
+    finally:
+        executor.shutdown()
+    assert transcribe.transcription_cache.stats()["memory_hits"] == 1
@@ -0,0 +1,76 @@
+import os
+import threading
+from collections import deque
+
+import pytest
+
+transcribe = pytest.importorskip("transcribe")
+from transcribe import DecodeProgress, _drain_stderr, _parse_duration, _read_progress
+
+STDERR = b"""Input #0, wav, from 'pipe:0':
+  Duration: 00:01:02.50, bitrate: 256 kb/s
+  Stream #0:0: Audio: pcm_s16le, 16000 Hz, mono, s16, 256 kb/s
+Output #0, f32le, to 'pipe:1':
+"""
+
+PROGRESS = b"""out_time_us=0
+speed=N/A
+progress=continue
+out_time_us=31250000
+speed=41.7x
+progress=continue
+out_time_us=62500000
+speed=40.2x
+progress=end
+"""
+
+
+def pipe_with(data: bytes) -> int:
+    """Return the read end of a pipe that yields `data` and then EOF."""
+    read_fd, write_fd = os.pipe()
+    writer = threading.Thread(target=lambda: (os.write(write_fd, data), os.close(write_fd)))
+    writer.start()
+    return read_fd
+
+
+def test_parse_duration():
+    assert _parse_duration(b"  Duration: 01:02:03.25, start: 0.000000, bitrate: 256 kb/s") == 3723.25
+    assert _parse_duration(b"  Duration: N/A, bitrate: N/A") is None
+    assert _parse_duration(b"Stream #0:0: Audio: opus") is None
+
+
+def test_stderr_keeps_a_tail_and_the_duration():
+    tail, duration = deque(maxlen=2), [None]
+    with os.fdopen(pipe_with(STDERR), "rb") as stderr:
+        _drain_stderr(stderr, tail, duration)
+    assert duration == [62.5]
+    assert list(tail) == [b"  Stream #0:0: Audio: pcm_s16le, 16000 Hz, mono, s16, 256 kb/s",
+                          b"Output #0, f32le, to 'pipe:1':"]
+
+
+def test_progress_blocks_become_events():
+    events = []
+    _read_progress(pipe_with(PROGRESS), [62.5], events.append)
+    assert events == [
+        DecodeProgress(0.0, 62.5, None, False),
+        DecodeProgress(31.25, 62.5, 41.7, False),
+        DecodeProgress(62.5, 62.5, 40.2, True),
+    ]
+
+
+def test_unknown_duration_is_reported_as_none():
+    events = []
+    _read_progress(pipe_with(PROGRESS), [None], events.append)
+    assert [event.total_seconds for event in events] == [None, None, None]
+
+
+def test_a_failing_callback_does_not_stop_the_reader():
+    events = []
+
+    def callback(event):
+        events.append(event)
+        raise RuntimeError("client went away")
+
+    _read_progress(pipe_with(PROGRESS), [62.5], callback)
+    # Every block is still read, so FFmpeg never blocks on a full progress pipe
+    assert [event.done for event in events] == [False, False, True]
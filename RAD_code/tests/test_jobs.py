@@ -0,0 +1,108 @@
+import multiprocessing
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import pytest
+
+jobs = pytest.importorskip("jobs")
+from jobs import JobRunner, JobStore, QUEUED, RUNNING, COMPLETED
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def test_claims_are_leased_to_one_owner(store):
+    job_id = store.create("a.wav", b"audio")
+    assert store.claim_next("runner-a") == job_id
+    assert store.claim_next("runner-b") is None
+    assert store.get(job_id)["status"] == RUNNING
+
+
+def test_fresh_leases_are_kept(store):
+    job_id = store.create("a.wav", b"audio")
+    store.claim_next("runner-a")
+    assert store.reclaim_stale(lease_seconds=60) == 0
+    assert store.get(job_id)["status"] == RUNNING
+
+
+def test_stale_leases_are_requeued(store):
+    job_id = store.create("a.wav", b"audio")
+    store.claim_next("runner-a")
+    time.sleep(0.05)
+    assert store.reclaim_stale(lease_seconds=0.01) == 1
+    assert store.get(job_id)["status"] == QUEUED
+    assert store.claim_next("runner-b") == job_id
+
+
+def test_heartbeat_renews_only_the_owners_lease(store):
+    job_id = store.create("a.wav", b"audio")
+    store.claim_next("runner-a")
+    time.sleep(0.05)
+    store.heartbeat([job_id], "runner-b")
+    assert store.reclaim_stale(lease_seconds=0.04) == 1
+
+    store.claim_next("runner-b")
+    time.sleep(0.05)
+    store.heartbeat([job_id], "runner-b")
+    assert store.reclaim_stale(lease_seconds=0.04) == 0
+
+
+def test_a_lost_lease_does_not_overwrite_the_new_run(store):
+    job_id = store.create("a.wav", b"audio")
+    store.claim_next("runner-a")
+    time.sleep(0.05)
+    store.reclaim_stale(lease_seconds=0.01)
+    store.claim_next("runner-b")
+
+    store.complete(job_id, "runner-a", "stale text")
+    assert store.get(job_id)["status"] == RUNNING
+    store.complete(job_id, "runner-b", "text")
+    assert store.get(job_id)["result"] == "text"
+
+
+def test_cache_hits_are_recorded_as_completed(store):
+    job_id = store.create("a.wav", None, result="text")
+    job = store.get(job_id)
+    assert (job["status"], job["result"], job["progress"]) == (COMPLETED, "text", 1.0)
+    assert store.claim_next("runner-a") is None
+
+
+def test_jobs_running_before_leases_existed_are_reclaimed(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, audio BLOB, "
+        "progress REAL NOT NULL DEFAULT 0, processed_seconds REAL NOT NULL DEFAULT 0, duration_seconds REAL, "
+        "result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO jobs (id, status, created_at, updated_at) VALUES ('old', ?, 0, 0)", (RUNNING,))
+    conn.commit()
+    conn.close()
+
+    store = JobStore(path)
+    assert store.reclaim_stale(lease_seconds=60) == 1
+    assert store.get("old")["status"] == QUEUED
+
+
+def _start_and_report_owner(runner, owners):
+    runner.start()
+    runner.stop()
+    owners.put(runner.owner)
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_runners_forked_from_one_import_get_their_own_owner(store):
+    # Like gunicorn with preload_app: the runner is built once, then each worker starts it
+    runner = JobRunner(store, SimpleNamespace(workers=1), poll_interval=0.01)
+    context = multiprocessing.get_context("fork")
+    owners = context.Queue()
+    processes = [context.Process(target=_start_and_report_owner, args=(runner, owners)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(10)
+    first, second = owners.get(timeout=5), owners.get(timeout=5)
+    assert first != second
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("model_registry")
+from model_registry import ModelRegistry
+
+
+class FakeEngine:
+    memory_bytes = 2 ** 20
+
+
+def load(name, device):
+    return FakeEngine()
+
+
+def test_instances_are_leased_one_caller_at_a_time():
+    registry = ModelRegistry(loader=load, max_replicas=1)
+    with registry.acquire("tiny") as first:
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(registry.acquire("tiny").__enter__()))
+        waiter.start()
+        waiter.join(0.1)
+        assert not acquired
+    waiter.join(1)
+    assert acquired == [first]
+
+
+def test_sweeper_unloads_idle_models_without_traffic():
+    registry = ModelRegistry(loader=load, idle_ttl=0.05)
+    registry.warm_up(["tiny"])
+    assert registry.loaded_models()[0]["memory_mb"] == 1.0
+    registry.start_sweeper(interval=0.02)
+    try:
+        deadline = time.monotonic() + 2
+        while registry.loaded_models() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert registry.loaded_models() == []
+    finally:
+        registry.stop_sweeper()
+
+
+def test_sweeper_keeps_models_in_use():
+    registry = ModelRegistry(loader=load, idle_ttl=0.01)
+    registry.start_sweeper(interval=0.01)
+    try:
+        with registry.acquire("tiny"):
+            time.sleep(0.1)
+            assert registry.loaded_models()[0]["in_use"] == 1
+    finally:
+        registry.stop_sweeper()
+
+
+def test_sweeper_is_not_started_without_limits():
+    registry = ModelRegistry(loader=load, idle_ttl=0, min_available_mb=0)
+    registry.start_sweeper(interval=0.01)
+    assert registry._sweeper is None
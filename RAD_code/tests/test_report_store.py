@@ -0,0 +1,59 @@
+import pytest
+
+from report_store import ReportStore, MAX_PAGE_SIZE
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReportStore(str(tmp_path / "reports.db"))
+    store.create("Right lower lobe pneumonia. Recommend follow-up.", "2024-03-01", "09:30", "right lower lobe",
+                 patient_id="P1", study_id="S1", audio_sha256="aa")
+    store.create("No pleural effusion. Lungs are clear.", "2024-03-02", patient_id="P1", study_id="S2")
+    store.create("Small left pleural effusion.", "2024-02-15", transcript="small left pleural effusion",
+                 patient_id="P2", study_id="S3")
+    return store
+
+
+def ids(page):
+    return [item["id"] for item in page["items"]]
+
+
+def test_get_returns_the_full_report(store):
+    report = store.get(1)
+    assert report["report_text"].startswith("Right lower lobe")
+    assert (report["patient_id"], report["report_time"], report["audio_sha256"]) == ("P1", "09:30", "aa")
+    assert store.get(99) is None
+
+
+def test_lists_newest_first(store):
+    page = store.search()
+    assert page["total"] == 3
+    assert ids(page) == [2, 1, 3]
+
+
+def test_filters_combine(store):
+    assert ids(store.search(patient_id="P1")) == [2, 1]
+    assert ids(store.search(study_id="S3")) == [3]
+    assert ids(store.search(date_from="2024-03-01", date_to="2024-03-01")) == [1]
+    assert ids(store.search(patient_id="P2", date_from="2024-03-01")) == []
+
+
+def test_full_text_search_matches_word_prefixes(store):
+    page = store.search("pleur eff")
+    assert sorted(ids(page)) == [2, 3]
+    assert all("[" in item["snippet"] for item in page["items"])
+    assert ids(store.search("pleural", patient_id="P2")) == [3]
+    # Stemming: "recommended" finds "Recommend"
+    assert ids(store.search("recommended")) == [1]
+
+
+def test_query_syntax_is_treated_as_words(store):
+    assert ids(store.search('pneumonia OR "effusion')) == []
+    assert store.search("*** ()")["total"] == 3
+
+
+def test_pagination(store):
+    first = store.search(limit=2)
+    second = store.search(limit=2, offset=2)
+    assert (first["total"], ids(first), ids(second)) == (3, [2, 1], [3])
+    assert store.search(limit=10_000)["limit"] == MAX_PAGE_SIZE
@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("spacy")
+from section_classifier import SectionClassifier
+
+REPORT = """X-RAY CHEST P.A. VIEW
+No midline shift seen.
+Both lung fields are clear.
+Cardiothoracic ratio appears normal.
+Both hila appear normal.
+Bilateral domes of diaphragm & costophrenic angles appear normal.
+Multiple wire clips are present.
+Advice: Clinical correlation."""
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return SectionClassifier()
+
+
+def test_categorizes_the_notebook_example(classifier):
+    categories = classifier.categorize(REPORT)
+    assert categories["Techniques"] == ["X-RAY CHEST P.A. VIEW"]
+    assert len(categories["Findings"]) == 6
+    assert categories["Inference"] == ["Advice: Clinical correlation."]
+
+
+@pytest.mark.parametrize("sentence", [
+    "Suggests pneumonia.",
+    "Recommend follow-up CT.",
+    "Recommends follow-up CT.",
+    "Findings suggesting early consolidation.",
+    "Impressions: no acute disease.",
+])
+def test_inflected_inference_terms(classifier, sentence):
+    assert classifier.categorize(sentence)["Inference"] == [sentence]
+
+
+def test_earlier_sections_win(classifier):
+    categories = classifier.categorize("Lateral view suggests a normal heart.")
+    assert categories["Techniques"] == ["Lateral view suggests a normal heart."]
+    assert categories["Findings"] == categories["Inference"] == []
+
+
+def test_batch_matches_single_reports(classifier):
+    reports = [REPORT, "Suggests pneumonia.", ""]
+    assert list(classifier.categorize_batch(reports)) == [classifier.categorize(report) for report in reports]
@@ -0,0 +1,92 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("streaming")
+from streaming import StreamingDecoder, StreamingTranscriber, transcribe_stream, RAW_PCM_FORMAT, SAMPLE_RATE
+
+
+def seconds(n: float) -> np.ndarray:
+    return np.zeros(int(n * SAMPLE_RATE), np.float32)
+
+
+def segment(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+
+def test_waits_for_a_full_step():
+    transcriber = StreamingTranscriber(step_seconds=3, overlap_seconds=2)
+    transcriber.add_audio(seconds(2))
+    assert transcriber.next_window() is None
+    transcriber.add_audio(seconds(1))
+    audio, prompt = transcriber.next_window()
+    assert len(audio) == 3 * SAMPLE_RATE and prompt is None
+
+
+def test_segments_before_the_overlap_are_final():
+    transcriber = StreamingTranscriber(step_seconds=3, overlap_seconds=2)
+    transcriber.add_audio(seconds(6))
+    transcriber.next_window()
+    events = transcriber.apply([segment(0, 2.5, "No acute"), segment(2.5, 3.8, "findings"), segment(4.2, 6, "seen")])
+    assert [(e["type"], e["text"]) for e in events] == [
+        ("final", "No acute"), ("final", "findings"), ("partial", "seen"),
+    ]
+    assert transcriber.text == "No acute findings"
+
+    # The committed audio is dropped; later timestamps stay relative to the recording
+    transcriber.add_audio(seconds(3))
+    audio, prompt = transcriber.next_window()
+    assert len(audio) == int(5.2 * SAMPLE_RATE)
+    assert prompt == "No acute findings"
+    events = transcriber.apply([segment(0.4, 2.0, "seen.")], final=True)
+    assert events == [{"type": "final", "start": 4.2, "end": 5.8, "text": "seen."}]
+    assert transcriber.text == "No acute findings seen."
+
+
+def test_a_full_window_commits_all_but_the_newest_segment():
+    transcriber = StreamingTranscriber(step_seconds=3, overlap_seconds=2, max_window_seconds=30)
+    transcriber.add_audio(seconds(30))
+    transcriber.next_window()
+    events = transcriber.apply([segment(0, 29.5, "long sentence"), segment(29.5, 30, "tail")])
+    assert [e["type"] for e in events] == ["final", "partial"]
+
+
+def test_a_full_silent_window_is_trimmed_to_the_overlap():
+    transcriber = StreamingTranscriber(step_seconds=3, overlap_seconds=2, max_window_seconds=30)
+    transcriber.add_audio(seconds(31))
+    transcriber.next_window()
+    assert transcriber.apply([]) == []
+    audio, _ = transcriber.next_window(final=True)
+    assert len(audio) == 2 * SAMPLE_RATE
+
+
+def test_transcribe_stream_with_raw_pcm():
+    windows = []
+
+    async def decode_window(audio, prompt):
+        windows.append((len(audio) / SAMPLE_RATE, prompt))
+        return [segment(0, len(audio) / SAMPLE_RATE, f"part{len(windows)}")]
+
+    async def chunks():
+        for _ in range(4):
+            yield seconds(1).tobytes()
+
+    async def collect():
+        return [event async for event in transcribe_stream(chunks(), decode_window, RAW_PCM_FORMAT)]
+
+    events = asyncio.run(collect())
+    assert events[-1] == {"type": "done", "text": "part2"}
+    assert [e["type"] for e in events[:-1]] == ["partial", "final"]
+    assert windows == [(3.0, None), (4.0, None)]
+
+
+@pytest.mark.parametrize("input_format", ["lavfi", "concat", "WEBM", ""])
+def test_unlisted_formats_are_refused(input_format):
+    with pytest.raises(ValueError):
+        StreamingDecoder(input_format)
+
+
+def test_listed_formats_are_accepted():
+    assert not StreamingDecoder("webm").raw
+    assert StreamingDecoder(RAW_PCM_FORMAT).raw
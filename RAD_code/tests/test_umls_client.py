@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("requests")
+from umls_client import UMLSClient, UMLSError
+
+
+class StubUMLS:
+    """Local stand-in for the UTS API. `responses` maps a path to a list of (status, body, headers)
+    answers, served in order; the last one repeats."""
+
+    def __init__(self):
+        self.responses = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                with stub._lock:
+                    stub.requests.append((url.path, parse_qs(url.query)))
+                    answers = stub.responses.get(url.path, [(404, {}, {})])
+                    status, body, headers = answers.pop(0) if len(answers) > 1 else answers[0]
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def count(self, path):
+        with self._lock:
+            return sum(1 for requested, _ in self.requests if requested == path)
+
+
+def search_result(cui):
+    return {"result": {"results": [{"ui": cui, "name": "x"}]}}
+
+
+def concept(*types):
+    return {"result": {"semanticTypes": [{"name": name} for name in types]}}
+
+
+@pytest.fixture
+def stub():
+    server = StubUMLS()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+@pytest.fixture
+def client(stub, tmp_path, monkeypatch):
+    # Keep retries fast; Retry-After is still honoured as sent
+    monkeypatch.setattr(UMLSClient, "_backoff", staticmethod(lambda attempt: 0.0))
+    with UMLSClient(api_key="key", base_url=stub.url, cache_path=str(tmp_path / "umls.db"),
+                    requests_per_second=0, max_retries=2, timeout=5) as umls:
+        yield umls
+
+
+def test_resolves_a_term_to_its_semantic_types(stub, client):
+    stub.responses["/search/current"] = [(200, search_result("C0032285"), {})]
+    stub.responses["/content/current/CUI/C0032285"] = [(200, concept("Disease or Syndrome"), {})]
+    assert client.get_semantic_type("pneumonia") == {
+        "term": "pneumonia", "cui": "C0032285", "semantic_types": ["Disease or Syndrome"],
+    }
+    assert stub.requests[0][1]["apiKey"] == ["key"]
+
+
+def test_429_waits_for_retry_after(stub, client):
+    stub.responses["/search/current"] = [
+        (429, {}, {"Retry-After": "0.3"}),
+        (200, search_result("C0032285"), {}),
+    ]
+    start = time.monotonic()
+    assert client.search_cui("pneumonia") == "C0032285"
+    assert time.monotonic() - start >= 0.3
+    assert stub.count("/search/current") == 2
+
+
+def test_5xx_retries_are_exhausted(stub, client):
+    stub.responses["/search/current"] = [(503, {}, {})]
+    with pytest.raises(UMLSError):
+        client.search_cui("pneumonia")
+    assert stub.count("/search/current") == client.max_retries + 1
+
+
+def test_failed_terms_map_to_none_in_bulk_lookups(stub, client):
+    stub.responses["/search/current"] = [(500, {}, {})]
+    assert client.get_semantic_types(["pneumonia"]) == {"pneumonia": None}
+
+
+def test_misses_are_cached(stub, client):
+    stub.responses["/search/current"] = [(200, search_result("NONE"), {})]
+    assert client.get_semantic_type("not a concept") is None
+    assert client.get_semantic_type("Not a  concept") is None
+    assert stub.count("/search/current") == 1
+
+
+def test_unknown_concepts_are_cached(stub, client):
+    assert client.semantic_types("C9999999") == []
+    assert client.semantic_types("C9999999") == []
+    assert stub.count("/content/current/CUI/C9999999") == 1
+
+
+def test_duplicate_terms_are_requested_once(stub, client):
+    stub.responses["/search/current"] = [(200, search_result("C0032285"), {})]
+    stub.responses["/content/current/CUI/C0032285"] = [(200, concept("Disease or Syndrome"), {})]
+    results = client.get_semantic_types(["pneumonia", "effusion", "pneumonia", "pneumonia"])
+    assert list(results) == ["pneumonia", "effusion"]
+    assert stub.count("/search/current") == 2
+    assert stub.count("/content/current/CUI/C0032285") == 1
+
+
+def test_spellings_of_one_term_share_a_request(stub, client):
+    stub.responses["/search/current"] = [(200, search_result("C0032285"), {})]
+    stub.responses["/content/current/CUI/C0032285"] = [(200, concept("Disease or Syndrome"), {})]
+    results = client.get_semantic_types(["pneumonia", "Pneumonia", " PNEUMONIA "])
+    assert len(results) == 3 and all(result["cui"] == "C0032285" for result in results.values())
+    assert stub.count("/search/current") == 1
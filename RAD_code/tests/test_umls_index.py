@@ -0,0 +1,92 @@
+import pytest
+
+from umls_index import UMLSIndex, build_index, normalize_term
+
+
+def conso(cui, string, sab="SNOMEDCT_US", lat="ENG", preferred=False, suppress="N"):
+    ts, stt, ispref = ("P", "PF", "Y") if preferred else ("S", "VO", "N")
+    fields = [cui, lat, ts, "L1", stt, "S1", ispref, "A1", "", "", "", sab, "PT", "C1", string, "0", suppress, ""]
+    return "|".join(fields) + "|\n"
+
+
+def sty(cui, tui, name):
+    return f"{cui}|{tui}|A1.2|{name}|AT1|256|\n"
+
+
+@pytest.fixture
+def rrf(tmp_path):
+    mrconso = tmp_path / "MRCONSO.RRF"
+    mrconso.write_text("".join([
+        conso("C0032285", "Pneumonia", preferred=True),
+        conso("C0032285", "Lung inflammation"),
+        conso("C0024109", "Lung", preferred=True),
+        # "Lung" is also an incidental synonym of another concept; the preferred name wins
+        conso("C0000001", "lung", sab="RADLEX"),
+        conso("C0000002", "Obsolete term", suppress="O"),
+        conso("C0000003", "Poumon", lat="FRE", preferred=True),
+    ]), encoding="utf-8")
+    mrsty = tmp_path / "MRSTY.RRF"
+    mrsty.write_text("".join([
+        sty("C0032285", "T047", "Disease or Syndrome"),
+        sty("C0024109", "T023", "Body Part, Organ, or Organ Component"),
+        sty("C9999999", "T047", "Disease or Syndrome"),
+    ]), encoding="utf-8")
+    return str(mrconso), str(mrsty)
+
+
+@pytest.fixture
+def index(rrf, tmp_path):
+    path = str(tmp_path / "umls.db")
+    stats = build_index(*rrf, output_path=path)
+    assert stats["concepts"] == 3
+    return UMLSIndex(path)
+
+
+def test_normalize_term():
+    assert normalize_term("  Lung.  ") == "lung"
+    assert normalize_term("Pleural\n  EFFUSION") == "pleural effusion"
+    assert normalize_term("(...)") == ""
+
+
+def test_lookup_many_resolves_spellings_to_the_preferred_concept(index):
+    results = index.lookup_many(["Lung", " lung. ", "pneumonia", "LUNG INFLAMMATION", "unknown", ""])
+    assert set(results) == {"Lung", " lung. ", "pneumonia", "LUNG INFLAMMATION"}
+    assert results["Lung"]["cui"] == results[" lung. "]["cui"] == "C0024109"
+    assert results["LUNG INFLAMMATION"] == {
+        "cui": "C0032285", "name": "Pneumonia",
+        "semantic_types": [{"tui": "T047", "name": "Disease or Syndrome"}],
+    }
+
+
+def test_suppressed_and_foreign_strings_are_skipped(index):
+    assert index.lookup("Obsolete term") is None
+    assert index.lookup("Poumon") is None
+
+
+def test_sources_filter(rrf, tmp_path):
+    path = str(tmp_path / "radlex.db")
+    build_index(*rrf, output_path=path, sources={"RADLEX"})
+    index = UMLSIndex(path)
+    assert index.lookup("lung")["cui"] == "C0000001"
+    assert index.lookup("pneumonia") is None
+
+
+def test_lookup_many_spans_several_chunks(index, monkeypatch):
+    monkeypatch.setattr("umls_index.LOOKUP_CHUNK_SIZE", 2)
+    terms = ["lung", "pneumonia", "lung inflammation", "missing", "Lung"]
+    assert {term: match["cui"] for term, match in index.lookup_many(terms).items()} == {
+        "lung": "C0024109", "pneumonia": "C0032285", "lung inflammation": "C0032285", "Lung": "C0024109",
+    }
+
+
+def test_annotate_entities(index):
+    entities = [{"text": "Pneumonia"}, {"text": "nothing"}]
+    index.annotate_entities(entities)
+    assert entities[0]["cui"] == "C0032285"
+    assert entities[0]["semantic_types"] == ["Disease or Syndrome"]
+    assert entities[1] == {"text": "nothing", "cui": None, "semantic_types": []}
+
+
+def test_missing_index_is_reported(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        UMLSIndex(str(tmp_path / "missing.db"))
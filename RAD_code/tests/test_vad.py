@@ -0,0 +1,61 @@
+import numpy as np
+
+import vad
+from vad import SAMPLE_RATE, detect_speech, pack_segments, speech_spans
+
+
+def tone(seconds: float, frequency: float = 440.0, amplitude: float = 0.3) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def test_detect_speech_drops_pauses(speech_like):
+    audio = speech_like(20)
+    segments = detect_speech(audio)
+    kept = sum(end - start for start, end in segments)
+    assert segments
+    assert 0.4 * len(audio) < kept < len(audio)
+    assert all(0 <= start < end <= len(audio) for start, end in segments)
+    assert all(a[1] <= b[0] for a, b in zip(segments, segments[1:]))
+
+
+def test_detect_speech_caps_segment_length(speech_like):
+    audio = speech_like(90, pause=(0.35, 0.5))
+    segments = detect_speech(audio)
+    assert max(end - start for start, end in segments) <= vad.VAD_MAX_SEGMENT_SECONDS * SAMPLE_RATE
+
+
+def test_detect_speech_ignores_silence_and_short_input():
+    assert detect_speech(np.zeros(5 * SAMPLE_RATE, np.float32)) == []
+    assert detect_speech(np.zeros(10, np.float32)) == []
+
+
+def test_pack_segments_groups_up_to_max_length():
+    second = SAMPLE_RATE
+    segments = [(0, 5 * second), (6 * second, 12 * second), (20 * second, 28 * second), (29 * second, 40 * second)]
+    assert pack_segments(segments) == [(0, 28 * second), (29 * second, 40 * second)]
+    assert pack_segments(segments, max_seconds=10) == [
+        (0, 5 * second), (6 * second, 12 * second), (20 * second, 28 * second), (29 * second, 40 * second)
+    ]
+    assert pack_segments([]) == []
+
+
+def test_speech_spans_packs_detected_speech(speech_like):
+    audio = speech_like(20)
+    assert speech_spans(audio) == pack_segments(detect_speech(audio))
+
+
+def test_speech_spans_is_empty_for_silence():
+    assert speech_spans(np.zeros(5 * SAMPLE_RATE, np.float32)) == []
+
+
+def test_speech_spans_falls_back_for_a_steady_tone():
+    # The 10th-percentile noise floor is the tone itself, so detect_speech keeps nothing
+    audio = tone(5)
+    assert detect_speech(audio) == []
+    assert speech_spans(audio) is None
+
+
+def test_speech_spans_falls_back_for_speech_under_constant_noise(speech_like):
+    audio = speech_like(20, noise=0.03)
+    assert speech_spans(audio) is None
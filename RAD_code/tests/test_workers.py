@@ -0,0 +1,43 @@
+import threading
+import time
+
+import pytest
+
+workers = pytest.importorskip("workers")
+import whisper_backends
+from workers import QueueFullError, TranscriptionExecutor
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    # Thread mode sizes torch's thread pool on start; this backend does not use torch
+    monkeypatch.setattr(whisper_backends, "WHISPER_BACKEND", "ctranslate2")
+    monkeypatch.setattr(workers.registry, "max_replicas", workers.registry.max_replicas)
+    executor = TranscriptionExecutor(mode="thread", workers=1, max_queue=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_submissions_beyond_capacity_are_rejected(executor):
+    started, release = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    running = executor.submit(job)
+    assert started.wait(5)
+    queued = executor.submit(job)
+    assert executor.stats() == {"mode": "thread", "workers": 1, "running": 1, "queued": 1, "max_queue": 1}
+    with pytest.raises(QueueFullError):
+        executor.submit(job)
+
+    release.set()
+    assert (running.result(5), queued.result(5)) == ("done", "done")
+    # Slots are released by the futures' done callbacks, just after the results are set
+    deadline = time.monotonic() + 5
+    while executor.stats()["running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert (executor.stats()["running"], executor.stats()["queued"]) == (0, 0)
+    assert executor.submit(lambda: "again").result(5) == "again"
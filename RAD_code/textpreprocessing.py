@@ -1,25 +1,141 @@
+import base64
+import os
 import spacy
 import sys
+import threading
+from spacy.tokens import DocBin
 
-def process_medical_transcription(transcription_text):
+from umls_index import UMLSIndex, UMLS_INDEX_PATH
+
+MODEL_NAME = "en_core_web_sm"
+# Loaded but inactive in en_core_web_sm; the parser already provides sentence boundaries
+EXCLUDED_COMPONENTS = ["senter"]
+DEFAULT_BATCH_SIZE = 64
+
+FIELDS = ("sentences", "entities", "tokens")
+# records: one dict per item, columnar: one list per attribute, docbin: base64 spaCy DocBin
+FORMATS = ("records", "columnar", "docbin")
+# Pipeline components each output field depends on; the rest are skipped for that call
+FIELD_COMPONENTS = {
+    "sentences": {"tok2vec", "parser"},
+    "entities": {"ner"},
+    "tokens": {"tok2vec", "tagger", "attribute_ruler", "lemmatizer"},
+}
+
+
+def _sentences(doc, offsets):
+    if offsets:
+        return [{"start": sent.start_char, "end": sent.end_char} for sent in doc.sents]
+    return [{"text": sent.text} for sent in doc.sents]
+
+
+def _entities(doc, offsets):
+    if offsets:
+        return [{"start": ent.start_char, "end": ent.end_char, "label": ent.label_} for ent in doc.ents]
+    return [{"text": ent.text, "label": ent.label_} for ent in doc.ents]
+
+
+def _tokens(doc, offsets):
+    if offsets:
+        return [{"start": token.idx, "end": token.idx + len(token), "lemma": token.lemma_, "pos": token.pos_}
+                for token in doc]
+    return [{"text": token.text, "lemma": token.lemma_, "pos": token.pos_} for token in doc]
+
+
+_EXTRACTORS = {"sentences": _sentences, "entities": _entities, "tokens": _tokens}
+
+
+def _columns(records):
+    keys = records[0].keys() if records else ()
+    return {key: [record[key] for record in records] for key in keys}
+
+
+class NLPService:
+    """Long-lived spaCy pipeline, loaded once and shared by every caller in the process."""
+
+    def __init__(self, model_name=MODEL_NAME, disable=(), umls_index=None):
+        self.nlp = spacy.load(model_name, exclude=EXCLUDED_COMPONENTS, disable=list(disable))
+        # Optional local UMLS index used to attach CUIs and semantic types to entities
+        self.umls_index = umls_index
+
+    def _disabled_for(self, fields, format):
+        if format == "docbin":
+            return []
+        needed = set().union(*(FIELD_COMPONENTS[field] for field in fields))
+        return [name for name in self.nlp.pipe_names if name not in needed]
+
+    @staticmethod
+    def _check_options(fields, format):
+        unknown = [field for field in fields if field not in FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(FIELDS)}")
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format: {format}. Choose from {', '.join(FORMATS)}")
+
+    @staticmethod
+    def to_results(doc, fields=FIELDS, offsets=False, format="records", umls_index=None):
+        """
+        Serialize a processed Doc. `fields` limits the output to what the caller needs,
+        `offsets` replaces repeated strings with character offsets into the input text.
+        """
+        if format == "docbin":
+            doc_bin = DocBin(store_user_data=False)
+            doc_bin.add(doc)
+            return {"docbin": base64.b64encode(doc_bin.to_bytes()).decode("ascii")}
+        results = {field: _EXTRACTORS[field](doc, offsets) for field in fields}
+        if umls_index is not None and "entities" in results:
+            umls_index.annotate_entities(results["entities"], [ent.text for ent in doc.ents])
+        if format == "columnar":
+            return {field: _columns(records) for field, records in results.items()}
+        if not offsets and "sentences" in results:
+            # Sentences have always been plain strings in the records format
+            results["sentences"] = [sent["text"] for sent in results["sentences"]]
+        return results
+
+    def process(self, text, fields=FIELDS, offsets=False, format="records"):
+        self._check_options(fields, format)
+        doc = self.nlp(text, disable=self._disabled_for(fields, format))
+        return self.to_results(doc, fields, offsets, format, self.umls_index)
+
+    def process_batch(self, texts, batch_size=DEFAULT_BATCH_SIZE, n_process=1, fields=FIELDS, offsets=False,
+                      format="records"):
+        """Lazily process many transcripts with nlp.pipe, yielding results in input order."""
+        self._check_options(fields, format)
+        docs = self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process,
+                             disable=self._disabled_for(fields, format))
+        return (self.to_results(doc, fields, offsets, format, self.umls_index) for doc in docs)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_nlp_service():
+    """Return the process-wide NLPService, loading the pipeline on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            umls_index = UMLSIndex(UMLS_INDEX_PATH) if os.path.exists(UMLS_INDEX_PATH) else None
+            _service = NLPService(umls_index=umls_index)
+        return _service
+
+
+def process_medical_transcription(transcription_text, fields=FIELDS, offsets=False, format="records"):
     
     try:
-        nlp = spacy.load("en_core_web_sm")
+        service = get_nlp_service()
     except OSError:
         print("Error: Model not found. Please install the required dependencies.")
         return None
     
-    # Process the text
-    doc = nlp(transcription_text)
-    
-    # Extract information
-    results = {
-        "sentences": [sent.text for sent in doc.sents],
-        "entities": [{"text": ent.text, "label": ent.label_} for ent in doc.ents],
-        "tokens": [{"text": token.text, "lemma": token.lemma_, "pos": token.pos_} for token in doc]
-    }
-    
-    return results
+    return service.process(transcription_text, fields=fields, offsets=offsets, format=format)
+
+
+def process_medical_transcriptions(transcriptions, batch_size=DEFAULT_BATCH_SIZE, n_process=1, fields=FIELDS,
+                                   offsets=False, format="records"):
+    """Process many transcriptions in batches; returns a generator of results in input order."""
+    return get_nlp_service().process_batch(transcriptions, batch_size=batch_size, n_process=n_process,
+                                           fields=fields, offsets=offsets, format=format)
 
 def print_results(results):
     """Print the processed results in a readable format"""
@@ -47,6 +163,17 @@ def print_results(results):
         print(f"...and {len(results['tokens']) - 10} more tokens")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        # Several files: process them together through nlp.pipe
+        transcriptions = []
+        for path in sys.argv[1:]:
+            with open(path, 'r') as file:
+                transcriptions.append(file.read())
+        for path, results in zip(sys.argv[1:], process_medical_transcriptions(transcriptions)):
+            print(f"\n##### {path}")
+            print_results(results)
+        sys.exit(0)
+
     if len(sys.argv) > 1:
         # Read from file if provided as argument
         with open(sys.argv[1], 'r') as file:
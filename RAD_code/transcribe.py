@@ -1,142 +1,345 @@
-import whisper
+import contextvars
+import re
 import tempfile
 import os
 import subprocess
-import sys
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from ffmpeg_probe import probe_ffmpeg
+from model_registry import registry, DEFAULT_MODEL
+from vad import speech_spans
+from batcher import batcher, BATCHING_ENABLED
+from cache import transcription_cache, cache_key, CACHE_ENABLED
+from whisper_backends import backend_settings
+from metrics import span
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('backend.log')
-    ]
-)
 logger = logging.getLogger(__name__)
 
-model = whisper.load_model("small")
-logger.info("Whisper model loaded successfully")
+SAMPLE_RATE = 16000
+# Split long recordings at silences and transcribe the speech spans in parallel
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+# Parallel span transcriptions per request (0 uses one per loaded model replica)
+VAD_SEGMENT_WORKERS = int(os.getenv("VAD_SEGMENT_WORKERS", "0"))
+# Forward every FFmpeg stderr line to the log (off by default: long files produce a lot of it)
+FFMPEG_LOG_LINES = os.getenv("FFMPEG_LOG_LINES", "0") == "1"
+# FFmpeg stderr lines kept for error messages
+STDERR_TAIL_LINES = 20
+
+_DURATION = re.compile(rb"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+_segment_pool = None
+_segment_pool_lock = threading.Lock()
+
+if BATCHING_ENABLED and not VAD_ENABLED:
+    # The batcher takes the speech spans VAD cuts; whole recordings are never split for it
+    logger.warning("WHISPER_BATCHING has no effect with VAD_ENABLED=0; recordings are transcribed one at a time")
 
 def check_ffmpeg():
-    """Check if FFmpeg is installed and accessible."""
+    """Check if FFmpeg is installed and accessible, using the cached probe."""
+    return probe_ffmpeg().available
+
+
+@dataclass(frozen=True)
+class DecodeProgress:
+    """One FFmpeg progress report. `total_seconds` is None when the container does not declare a duration."""
+    processed_seconds: float
+    total_seconds: Optional[float]
+    speed: Optional[float]
+    done: bool
+
+
+def _parse_duration(line: bytes):
+    match = _DURATION.search(line)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _feed_stdin(stdin, data: bytes):
     try:
-        subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-        logger.info("FFmpeg is available")
-        return True
-    except (subprocess.SubprocessError, FileNotFoundError):
-        logger.warning("FFmpeg is not installed or not in PATH")
-        return False
-
-def preprocess_audio(input_path: str) -> str:
+        stdin.write(data)
+    except BrokenPipeError:
+        # FFmpeg gave up on the input; its exit status and stderr say why
+        pass
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def _drain_stderr(stderr, tail, duration):
+    for line in stderr:
+        line = line.rstrip()
+        if duration[0] is None:
+            duration[0] = _parse_duration(line)
+        tail.append(line)
+        if FFMPEG_LOG_LINES:
+            logger.info(f"ffmpeg: {line.decode(errors='replace')}")
+
+
+def _read_progress(fd: int, duration, progress_callback):
+    block = {}
+    with os.fdopen(fd, "rb") as f:
+        for line in f:
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            block[key] = value
+            if key != "progress":
+                continue
+            try:
+                processed = int(block.get("out_time_us", "")) / 1e6
+            except ValueError:
+                processed = 0.0
+            try:
+                speed = float(block.get("speed", "").rstrip("x"))
+            except ValueError:
+                speed = None
+            block = {}
+            try:
+                progress_callback(DecodeProgress(max(0.0, processed), duration[0], speed, value == "end"))
+            except Exception as e:
+                # Keep draining the pipe, or FFmpeg would block writing to it
+                logger.warning(f"Decode progress callback failed: {str(e)}")
+
+
+def _run_ffmpeg_decode(input_arg: str, data: bytes = None, progress_callback=None) -> bytes:
+    cmd = [probe_ffmpeg().path]
+    if data is None:
+        cmd.append('-nostdin')  # reading from a file, keep ffmpeg off our stdin
+    # Progress goes to its own pipe (stdout carries the PCM); pass_fds needs POSIX
+    report_progress = progress_callback is not None and os.name == "posix"
+    progress_read = progress_write = None
+    if report_progress:
+        progress_read, progress_write = os.pipe()
+        cmd += ['-nostats', '-progress', f'pipe:{progress_write}']
+    cmd += [
+        # "info" only adds the input header, which carries the duration the progress events need
+        '-loglevel', 'info' if report_progress or FFMPEG_LOG_LINES else 'error',
+        '-i', input_arg,
+        '-f', 'f32le',  # raw 32-bit float PCM
+        '-acodec', 'pcm_f32le',
+        '-ac', '1',  # mono
+        '-ar', str(SAMPLE_RATE),  # 16kHz sample rate
+        'pipe:1'
+    ]
+
+    tail = deque(maxlen=STDERR_TAIL_LINES)
+    duration = [None]
+    with span("decode"):
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE if data is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                pass_fds=(progress_write,) if report_progress else (),
+            )
+        except Exception:
+            if report_progress:
+                os.close(progress_read)
+            raise
+        finally:
+            if report_progress:
+                os.close(progress_write)
+
+        # stdin, stderr and the progress pipe are serviced on their own threads while this one reads
+        # the PCM, so none of the pipes can fill up and stall FFmpeg
+        threads = [threading.Thread(target=_drain_stderr, args=(process.stderr, tail, duration), daemon=True)]
+        if data is not None:
+            threads.append(threading.Thread(target=_feed_stdin, args=(process.stdin, data), daemon=True))
+        if report_progress:
+            threads.append(threading.Thread(target=_read_progress, args=(progress_read, duration, progress_callback),
+                                            daemon=True))
+        for thread in threads:
+            thread.start()
+        pcm = process.stdout.read()
+        process.stdout.close()
+        process.wait()
+        for thread in threads:
+            thread.join()
+        process.stderr.close()
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, output=None, stderr=b"\n".join(tail))
+    return pcm
+
+
+def preprocess_audio(source, progress_callback=None) -> np.ndarray:
     """
-    Preprocess audio file using FFmpeg to ensure compatibility with Whisper.
-    Converts audio to 16kHz mono WAV format.
+    Decode audio with FFmpeg into the 16kHz mono float32 PCM that Whisper expects.
+    `source` is either the raw bytes of an uploaded file or a path on disk.
+    `progress_callback(DecodeProgress)` receives FFmpeg's progress reports, about twice a second.
     """
     if not check_ffmpeg():
-        logger.warning("FFmpeg is not installed or not in PATH. Using original file without preprocessing.")
-        return input_path
-
-    logger.info(f"Preprocessing audio file: {input_path}")
-    
-    # Create a temporary file with a unique name
-    temp_output = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-    temp_output.close()  # Close the file so FFmpeg can access it
-    
+        raise RuntimeError("FFmpeg is required to decode audio but was not found in PATH")
+
     try:
-        # Get absolute paths
-        input_path = os.path.abspath(input_path)
-        output_path = os.path.abspath(temp_output.name)
-        
-        # Create the FFmpeg command with progress information
-        cmd = [
-            'ffmpeg',
-            '-y',  # Overwrite output file without asking
-            '-i', f'"{input_path}"',
-            '-ac', '1',  # mono
-            '-ar', '16000',  # 16kHz sample rate
-            '-loglevel', 'info',  # Changed from error to info to see progress
-            '-progress', 'pipe:1',  # Show progress
-            f'"{output_path}"'
-        ]
-        
-        logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-        
-        # Run the command with shell=True and capture output
-        process = subprocess.Popen(
-            ' '.join(cmd),
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        # Read output in real-time
-        while True:
-            output = process.stdout.readline()
-            if output == '' and process.poll() is not None:
-                break
-            if output:
-                logger.info(f"FFmpeg: {output.strip()}")
-        
-        # Check for errors
-        _, stderr = process.communicate()
-        if process.returncode != 0:
-            raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
-        
-        if stderr:
-            logger.warning(f"FFmpeg warnings: {stderr}")
-        
-        logger.info(f"Audio preprocessing completed. Output saved to: {output_path}")
-        return output_path
-        
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            logger.info(f"Decoding {len(source)} bytes of uploaded audio")
+            try:
+                pcm = _run_ffmpeg_decode('pipe:0', bytes(source), progress_callback)
+            except subprocess.CalledProcessError:
+                # MP4/M4A files with the index at the end cannot be demuxed from a pipe
+                logger.warning("Decoding from stdin failed, retrying from a seekable temporary file")
+                with tempfile.NamedTemporaryFile() as seekable:
+                    seekable.write(source)
+                    seekable.flush()
+                    pcm = _run_ffmpeg_decode(seekable.name, progress_callback=progress_callback)
+        else:
+            logger.info(f"Decoding audio file: {source}")
+            pcm = _run_ffmpeg_decode(os.fspath(source), progress_callback=progress_callback)
     except subprocess.CalledProcessError as e:
-        error_msg = e.stderr if isinstance(e.stderr, str) else e.stderr.decode() if e.stderr else str(e)
-        logger.error(f"FFmpeg error: {error_msg}")
-        if os.path.exists(temp_output.name):
-            os.unlink(temp_output.name)
-        raise
-    except Exception as e:
-        logger.error(f"Error processing audio: {str(e)}")
-        if os.path.exists(temp_output.name):
-            os.unlink(temp_output.name)
+        logger.error(f"FFmpeg error: {e.stderr.decode(errors='replace') if e.stderr else str(e)}")
         raise
 
-def transcribe_audio(file_path: str) -> str:
-    """Transcribe audio file using Whisper."""
-    logger.info(f"Starting transcription for file: {file_path}")
-    temp_file = None
+    audio = np.frombuffer(pcm, np.float32)
+    logger.info(f"Audio decoded: {len(audio) / SAMPLE_RATE:.1f}s of 16kHz PCM")
+    return audio
+
+def transcribe_window(audio: np.ndarray, prompt: str = None, model_name: str = DEFAULT_MODEL):
+    """Transcribe a short PCM window and return its segments, timed relative to the window start."""
+    with registry.acquire(model_name) as engine, span("inference"):
+        result = engine.transcribe(audio, language="en", initial_prompt=prompt, condition_on_previous_text=False)
+    return result["segments"]
+
+def _get_segment_pool():
+    global _segment_pool
+    with _segment_pool_lock:
+        if _segment_pool is None:
+            workers = VAD_SEGMENT_WORKERS or registry.max_replicas
+            _segment_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whisper-segment")
+        return _segment_pool
+
+def transcribe_segments(audio: np.ndarray, model_name: str = DEFAULT_MODEL, progress_callback=None):
+    """
+    Cut decoded PCM at silences, drop the silent stretches and transcribe the
+    remaining speech spans in parallel. Returns the segments in order, timed from
+    the start of the recording, or None when VAD could not find the speech and the
+    recording has to be transcribed whole.
+    """
+    with span("vad"):
+        spans = speech_spans(audio)
+    if spans is None:
+        return None
+    total_seconds = sum(end - start for start, end in spans) / SAMPLE_RATE
+    logger.info(f"VAD kept {total_seconds:.1f}s of speech out of {len(audio) / SAMPLE_RATE:.1f}s "
+                f"in {len(spans)} span(s)")
+
+    # The batcher decodes with a single model, so other model sizes take the per-span path below
+    if BATCHING_ENABLED and model_name == batcher.model_name:
+        # Each span fits one 30 s window; the batcher decodes them together with other requests' windows
+        texts = batcher.transcribe([audio[start:end] for start, end in spans])
+        if progress_callback is not None:
+            progress_callback(total_seconds, total_seconds)
+        return [
+            {"start": round(start / SAMPLE_RATE, 2), "end": round(end / SAMPLE_RATE, 2), "text": text}
+            for (start, end), text in zip(spans, texts)
+            if text
+        ]
+
+    done = [0.0]
+    done_lock = threading.Lock()
+
+    def report(span_seconds):
+        if progress_callback is not None:
+            with done_lock:
+                done[0] += span_seconds
+                processed = done[0]
+            progress_callback(processed, total_seconds)
+
+    futures = []
+    pool = _get_segment_pool()
+    for start, end in spans:
+        # Carry the request ID over to the segment threads' log lines
+        future = pool.submit(contextvars.copy_context().run, transcribe_window, audio[start:end], None, model_name)
+        future.add_done_callback(lambda _, seconds=(end - start) / SAMPLE_RATE: report(seconds))
+        futures.append(future)
+
+    segments = []
+    for (start, _), future in zip(spans, futures):
+        offset = start / SAMPLE_RATE
+        for segment in future.result():
+            if segment["text"]:
+                segments.append({
+                    "start": round(offset + segment["start"], 2),
+                    "end": round(offset + segment["end"], 2),
+                    "text": segment["text"],
+                })
+    return segments
+
+def lookup_transcription(audio, model_name: str = DEFAULT_MODEL):
+    """
+    Check the transcription cache without taking a worker, so re-uploads are answered
+    (or queued) on the request path. Returns (key, text); text is None on a miss and
+    key is None when caching is disabled.
+    """
+    if not CACHE_ENABLED:
+        return None, None
+    key = cache_key(audio, model_name, "en", vad=VAD_ENABLED, batching=BATCHING_ENABLED, **backend_settings())
+    text = transcription_cache.get(key)
+    if text is not None:
+        logger.info(f"Transcription served from cache ({key[:12]})")
+    return key, text
+
+def transcribe_audio(audio, model_name: str = DEFAULT_MODEL, progress_callback=None, key: str = None) -> str:
+    """
+    Transcribe audio using a shared Whisper model from the registry, on the configured backend.
+    `audio` may be raw file bytes, a file path or already decoded 16kHz PCM.
+    `progress_callback(processed_seconds, total_seconds)` is called after each transcribed window, and
+    with a third argument, stage="decode", while FFmpeg decodes an upload.
+    Results are cached by audio content and decode settings. Pass the `key` from a
+    lookup_transcription() miss to skip the second lookup; the caller then stores the
+    result with store_transcription(), since a process-mode worker has its own cache.
+    """
+    if key is not None:
+        return _transcribe_uncached(audio, model_name, progress_callback)
+    key, text = lookup_transcription(audio, model_name)
+    if text is not None:
+        return text
+    text = _transcribe_uncached(audio, model_name, progress_callback)
+    store_transcription(key, text)
+    return text
+
+def store_transcription(key: Optional[str], text: str):
+    """Cache a transcription under a lookup_transcription() key."""
+    # An empty result may be a VAD miss or a bad decode; let the next upload try again
+    if key is not None and text.strip():
+        transcription_cache.put(key, text)
+
+def _decode_progress(progress_callback):
+    if progress_callback is None:
+        return None
+    return lambda event: progress_callback(event.processed_seconds, event.total_seconds, "decode")
+
+def _transcribe_uncached(audio, model_name: str, progress_callback) -> str:
     try:
-        # Preprocess the audio file
-        temp_file = preprocess_audio(file_path)
-        if not temp_file:
-            raise Exception("Audio preprocessing failed")
-            
-        # Load Whisper model
-        logger.info("Loading Whisper model...")
-        model = whisper.load_model("small")
-        logger.info("Whisper model loaded successfully")
-        
-        # Transcribe the audio
-        logger.info(f"Starting transcription of file: {temp_file}")
-        result = model.transcribe(temp_file,language="en")
+        if not isinstance(audio, np.ndarray):
+            audio = preprocess_audio(audio, _decode_progress(progress_callback))
+
+        if VAD_ENABLED:
+            segments = transcribe_segments(audio, model_name, progress_callback)
+            if segments is not None:
+                logger.info("Transcription completed successfully")
+                return " ".join(segment["text"] for segment in segments)
+
+        # Transcribe the whole recording with the shared model (VAD is off, or could not find the speech)
+        if BATCHING_ENABLED and VAD_ENABLED:
+            logger.info("VAD found no speech spans; transcribing the recording whole, outside the batcher")
+        logger.info(f"Starting transcription of {len(audio) / SAMPLE_RATE:.1f}s of audio")
+        with registry.acquire(model_name) as engine, span("inference"):
+            result = engine.transcribe(audio, language="en", progress_callback=progress_callback)
         logger.info("Transcription completed successfully")
         
-        # Clean up temporary file
-        if temp_file and os.path.exists(temp_file):
-            os.unlink(temp_file)
-            logger.info(f"Temporary file cleaned up: {temp_file}")
-            
         return result["text"]
         
-    except subprocess.CalledProcessError as e:
-        logger.error(f"FFmpeg processing failed: {e.stderr.decode() if e.stderr else str(e)}")
-        if temp_file and os.path.exists(temp_file):
-            os.unlink(temp_file)
-        raise
     except Exception as e:
         logger.error(f"Transcription failed: {str(e)}")
-        if temp_file and os.path.exists(temp_file):
-            os.unlink(temp_file)
         raise
@@ -0,0 +1,249 @@
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from umls_index import normalize_term
+
+logger = logging.getLogger(__name__)
+
+UMLS_BASE_URL = os.getenv("UMLS_BASE_URL", "https://uts-ws.nlm.nih.gov")
+UMLS_API_KEY = os.getenv("UMLS_API_KEY", "")
+UMLS_VERSION = os.getenv("UMLS_VERSION", "current")
+# Persistent term -> CUI and CUI -> semantic type cache; empty disables it
+UMLS_CACHE_DB = os.getenv("UMLS_CACHE_DB", "umls_cache.db")
+UMLS_CACHE_TTL_SECONDS = float(os.getenv("UMLS_CACHE_TTL_SECONDS", str(30 * 86400)))
+UMLS_MAX_CONCURRENCY = int(os.getenv("UMLS_MAX_CONCURRENCY", "8"))
+# UTS allows about 20 requests per second per key; stay below it
+UMLS_REQUESTS_PER_SECOND = float(os.getenv("UMLS_REQUESTS_PER_SECOND", "15"))
+UMLS_MAX_RETRIES = int(os.getenv("UMLS_MAX_RETRIES", "5"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lookups (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+"""
+
+_MISSING = object()
+
+
+class UMLSError(Exception):
+    """Raised when the UMLS API keeps failing after all retries."""
+
+
+class _RateLimiter:
+    """Spaces requests evenly so the shared API key stays under its quota."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class _LookupCache:
+    def __init__(self, path: str, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        if path:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, kind: str, key: str):
+        if not self.path:
+            return _MISSING
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM lookups WHERE kind = ? AND key = ? AND expires_at > ?", (kind, key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else _MISSING
+
+    def put(self, kind: str, key: str, value):
+        if not self.path:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO lookups (kind, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (kind, key, json.dumps(value), time.time() + self.ttl_seconds),
+            )
+
+
+class UMLSClient:
+    """
+    Reusable client for the UMLS REST API.
+
+    Connections are pooled in one requests.Session, term lists are resolved
+    concurrently on a bounded thread pool, every request goes through a client-side
+    rate limiter, 429/5xx answers are retried with backoff (honouring Retry-After),
+    and both term -> CUI and CUI -> semantic type answers, including "not found",
+    are cached in SQLite. Concurrent lookups of the same key share one request.
+    Point `base_url` at a local stub server for testing.
+    """
+
+    def __init__(self, api_key: str = UMLS_API_KEY, base_url: str = UMLS_BASE_URL, version: str = UMLS_VERSION,
+                 max_concurrency: int = UMLS_MAX_CONCURRENCY, requests_per_second: float = UMLS_REQUESTS_PER_SECOND,
+                 cache_path: str = UMLS_CACHE_DB, cache_ttl_seconds: float = UMLS_CACHE_TTL_SECONDS,
+                 max_retries: int = UMLS_MAX_RETRIES, timeout: float = 10.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.version = version
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="umls")
+        self._limiter = _RateLimiter(requests_per_second)
+        self._cache = _LookupCache(cache_path, cache_ttl_seconds)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get(self, path: str, params: dict):
+        params = {**params, "apiKey": self.api_key}
+        for attempt in range(self.max_retries + 1):
+            self._limiter.wait()
+            try:
+                response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise UMLSError(f"UMLS request to {path} failed: {e}") from e
+                delay = self._backoff(attempt)
+            else:
+                if response.status_code == 404:
+                    return None
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    response.encoding = "utf-8"
+                    return response.json()
+                if attempt == self.max_retries:
+                    raise UMLSError(f"UMLS request to {path} failed with HTTP {response.status_code}")
+                delay = self._retry_after(response) or self._backoff(attempt)
+            logger.warning(f"UMLS request to {path} will be retried in {delay:.1f}s")
+            time.sleep(delay)
+
+    def _lookup(self, kind: str, key: str, fetch):
+        """Return a cached answer, or fetch and cache it; callers asking for the same key meanwhile wait for it."""
+        cached = self._cache.get(kind, key)
+        if cached is not _MISSING:
+            return cached
+        with self._inflight_lock:
+            future = self._inflight.get((kind, key))
+            leader = future is None
+            if leader:
+                future = self._inflight[(kind, key)] = Future()
+        if not leader:
+            return future.result()
+        try:
+            # Another leader may have finished between the first cache check and taking the lead
+            value = self._cache.get(kind, key)
+            if value is _MISSING:
+                value = fetch()
+                self._cache.put(kind, key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[(kind, key)]
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    def search_cui(self, term: str, sabs: str = None, search_type: str = None):
+        """Return the CUI of the best match for a term, or None."""
+        def fetch():
+            data = self._get(f"/search/{self.version}", {
+                "string": term.strip(),
+                "sabs": sabs,
+                "searchType": search_type,
+                "pageNumber": 1,
+            })
+            results = (data or {}).get("result", {}).get("results", [])
+            # The search API answers "no match" with a single NONE placeholder
+            return results[0]["ui"] if results and results[0].get("ui") != "NONE" else None
+
+        return self._lookup("term", f"{normalize_term(term)}|{sabs or ''}|{search_type or ''}", fetch)
+
+    def semantic_types(self, cui: str):
+        """Return the semantic type names of a concept."""
+        def fetch():
+            data = self._get(f"/content/{self.version}/CUI/{cui}", {})
+            return [t["name"] for t in (data or {}).get("result", {}).get("semanticTypes", [])]
+
+        return self._lookup("cui", cui, fetch)
+
+    def get_semantic_type(self, term: str, sabs: str = None, search_type: str = None):
+        """Resolve one term to {"term", "cui", "semantic_types"}, or None when UMLS has no match."""
+        cui = self.search_cui(term, sabs, search_type)
+        if cui is None:
+            return None
+        return {"term": term, "cui": cui, "semantic_types": self.semantic_types(cui)}
+
+    def get_semantic_types(self, terms, sabs: str = None, search_type: str = None):
+        """
+        Resolve many terms concurrently. Returns {term: result or None}; duplicate terms
+        are requested once and terms that fail after all retries map to None.
+        """
+        unique = list(dict.fromkeys(terms))
+        futures = {term: self._pool.submit(self.get_semantic_type, term, sabs, search_type) for term in unique}
+        results = {}
+        for term, future in futures.items():
+            try:
+                results[term] = future.result()
+            except (UMLSError, requests.HTTPError) as e:
+                logger.error(f"UMLS lookup for '{term}' failed: {str(e)}")
+                results[term] = None
+        return results
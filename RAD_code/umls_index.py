@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+UMLS_INDEX_PATH = os.getenv("UMLS_INDEX_PATH", "umls.db")
+# Bulk lookups are split into IN (...) queries of this many terms
+LOOKUP_CHUNK_SIZE = 500
+INSERT_BATCH_SIZE = 50000
+
+# MRCONSO.RRF / MRSTY.RRF column positions (see the UMLS Reference Manual)
+CONSO_CUI, CONSO_LAT, CONSO_TS, CONSO_STT, CONSO_ISPREF, CONSO_SAB, CONSO_STR, CONSO_SUPPRESS = 0, 1, 2, 4, 6, 11, 14, 16
+STY_CUI, STY_TUI, STY_STY = 0, 1, 3
+
+_SCHEMA = """
+CREATE TABLE terms (
+    norm TEXT NOT NULL,
+    cui TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    PRIMARY KEY (norm, cui)
+) WITHOUT ROWID;
+CREATE TABLE concepts (
+    cui TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE semantic_types (
+    cui TEXT NOT NULL,
+    tui TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (cui, tui)
+) WITHOUT ROWID;
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_term(term: str) -> str:
+    """Lower-case, trim surrounding punctuation and collapse whitespace, so ' Lung. ' matches 'lung'."""
+    return _WHITESPACE.sub(" ", term.strip().strip(".,;:!?\"'()[]").lower()).strip()
+
+
+def _read_rrf(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n").split("|")
+
+
+def build_index(mrconso_path: str, mrsty_path: str, output_path: str = UMLS_INDEX_PATH,
+                language: str = "ENG", sources=None):
+    """
+    Ingest MRCONSO.RRF and MRSTY.RRF (or a subset of them) into an indexed SQLite file.
+    `sources` optionally restricts terms to the given source vocabularies (SAB), e.g. {"SNOMEDCT_US", "RADLEX"}.
+    The index is written next to `output_path` and moved into place when complete.
+    """
+    sources = set(sources) if sources else None
+    temp_path = output_path + ".building"
+    if os.path.exists(temp_path):
+        os.unlink(temp_path)
+    start = time.perf_counter()
+
+    conn = sqlite3.connect(temp_path)
+    conn.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;" + _SCHEMA)
+
+    terms = {}
+    names = {}
+    for row in _read_rrf(mrconso_path):
+        if row[CONSO_LAT] != language or row[CONSO_SUPPRESS] in ("O", "E", "Y"):
+            continue
+        if sources is not None and row[CONSO_SAB] not in sources:
+            continue
+        cui = row[CONSO_CUI]
+        preferred = row[CONSO_TS] == "P" and row[CONSO_STT] == "PF" and row[CONSO_ISPREF] == "Y"
+        norm = normalize_term(row[CONSO_STR])
+        if not norm:
+            continue
+        # Rank 0 when the string is the concept's preferred name, so it wins over incidental synonyms
+        rank = 0 if preferred else 1
+        key = (norm, cui)
+        if terms.get(key, 2) > rank:
+            terms[key] = rank
+        if preferred or cui not in names:
+            names[cui] = row[CONSO_STR]
+        if len(terms) >= INSERT_BATCH_SIZE:
+            _flush_terms(conn, terms)
+
+    _flush_terms(conn, terms)
+    conn.executemany("INSERT OR REPLACE INTO concepts (cui, name) VALUES (?, ?)", names.items())
+
+    conn.executemany(
+        "INSERT OR IGNORE INTO semantic_types (cui, tui, name) VALUES (?, ?, ?)",
+        ((row[STY_CUI], row[STY_TUI], row[STY_STY]) for row in _read_rrf(mrsty_path) if row[STY_CUI] in names),
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    os.replace(temp_path, output_path)
+    return {"concepts": len(names), "seconds": round(time.perf_counter() - start, 1)}
+
+
+def _flush_terms(conn, terms):
+    # A pair flushed earlier keeps its best rank
+    conn.executemany(
+        "INSERT INTO terms (norm, cui, rank) VALUES (?, ?, ?) "
+        "ON CONFLICT (norm, cui) DO UPDATE SET rank = MIN(rank, excluded.rank)",
+        ((norm, cui, rank) for (norm, cui), rank in terms.items()),
+    )
+    terms.clear()
+
+
+class UMLSIndex:
+    """Read-only, offline term -> CUI -> semantic type lookups against an index built by build_index()."""
+
+    def __init__(self, path: str = UMLS_INDEX_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"UMLS index not found: {path}")
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, term: str):
+        """Return the best matching concept for a term, or None."""
+        return self.lookup_many([term]).get(term)
+
+    def lookup_many(self, terms):
+        """
+        Resolve many terms at once. Returns {term: {"cui", "name", "semantic_types"}}
+        for the terms that match, using the best-ranked concept per term.
+        """
+        by_norm = {}
+        for term in terms:
+            norm = normalize_term(term)
+            if norm:
+                by_norm.setdefault(norm, []).append(term)
+        if not by_norm:
+            return {}
+
+        conn = self._conn()
+        best = {}
+        norms = list(by_norm)
+        for i in range(0, len(norms), LOOKUP_CHUNK_SIZE):
+            chunk = norms[i:i + LOOKUP_CHUNK_SIZE]
+            rows = conn.execute(
+                f"SELECT norm, cui FROM terms WHERE norm IN ({','.join('?' * len(chunk))}) ORDER BY norm, rank, cui",
+                chunk,
+            )
+            for norm, cui in rows:
+                best.setdefault(norm, cui)
+
+        concepts = self._concepts(conn, set(best.values()))
+        results = {}
+        for norm, cui in best.items():
+            for term in by_norm[norm]:
+                results[term] = concepts[cui]
+        return results
+
+    def _concepts(self, conn, cuis):
+        concepts = {}
+        cuis = list(cuis)
+        for i in range(0, len(cuis), LOOKUP_CHUNK_SIZE):
+            chunk = cuis[i:i + LOOKUP_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            for cui, name in conn.execute(f"SELECT cui, name FROM concepts WHERE cui IN ({placeholders})", chunk):
+                concepts[cui] = {"cui": cui, "name": name, "semantic_types": []}
+            for cui, tui, name in conn.execute(
+                f"SELECT cui, tui, name FROM semantic_types WHERE cui IN ({placeholders}) ORDER BY cui, tui", chunk
+            ):
+                concepts[cui]["semantic_types"].append({"tui": tui, "name": name})
+        return concepts
+
+    def annotate_entities(self, entities, texts=None):
+        """
+        Add "cui" and "semantic_types" to entity records in place.
+        `texts` gives the surface strings when the records carry offsets instead of text.
+        """
+        texts = texts if texts is not None else [entity["text"] for entity in entities]
+        matches = self.lookup_many(texts)
+        for entity, text in zip(entities, texts):
+            match = matches.get(text)
+            entity["cui"] = match["cui"] if match else None
+            entity["semantic_types"] = [t["name"] for t in match["semantic_types"]] if match else []
+        return entities
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the local UMLS semantic type index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Ingest MRCONSO.RRF and MRSTY.RRF")
+    build.add_argument("--mrconso", required=True)
+    build.add_argument("--mrsty", required=True)
+    build.add_argument("--output", default=UMLS_INDEX_PATH)
+    build.add_argument("--language", default="ENG")
+    build.add_argument("--sources", help="Comma separated SAB codes to keep, e.g. SNOMEDCT_US,RADLEX")
+
+    lookup = commands.add_parser("lookup", help="Look up terms")
+    lookup.add_argument("terms", nargs="+")
+    lookup.add_argument("--index", default=UMLS_INDEX_PATH)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        sources = args.sources.split(",") if args.sources else None
+        stats = build_index(args.mrconso, args.mrsty, args.output, args.language, sources)
+        print(f"Indexed {stats['concepts']} concepts into {args.output} in {stats['seconds']}s")
+    else:
+        json.dump(UMLSIndex(args.index).lookup_many(args.terms), sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
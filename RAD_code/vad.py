@@ -0,0 +1,114 @@
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+
+# Speech must be this many dB above the estimated noise floor
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "12"))
+# Frames quieter than this are never speech, however quiet the recording is
+VAD_MIN_ENERGY_DB = float(os.getenv("VAD_MIN_ENERGY_DB", "-55"))
+# Pauses shorter than this are kept inside a speech region
+VAD_MIN_SILENCE_SECONDS = float(os.getenv("VAD_MIN_SILENCE_SECONDS", "0.6"))
+# Bursts shorter than this (clicks, breaths) are ignored
+VAD_MIN_SPEECH_SECONDS = float(os.getenv("VAD_MIN_SPEECH_SECONDS", "0.25"))
+# Padding kept around each region so word onsets and endings are not clipped
+VAD_PAD_SECONDS = float(os.getenv("VAD_PAD_SECONDS", "0.2"))
+# Whisper decodes 30 s windows, so segments are packed up to (and never beyond) that length
+VAD_MAX_SEGMENT_SECONDS = min(30.0, float(os.getenv("VAD_MAX_SEGMENT_SECONDS", "30")))
+# Keeping less than this share of the audible frames means the detector could not tell speech from background
+VAD_MIN_SPEECH_RATIO = float(os.getenv("VAD_MIN_SPEECH_RATIO", "0.25"))
+
+
+def frame_energy_db(audio: np.ndarray, frame_length: int) -> np.ndarray:
+    """RMS energy in dBFS of consecutive non-overlapping frames."""
+    n_frames = len(audio) // frame_length
+    frames = audio[:n_frames * frame_length].reshape(n_frames, frame_length)
+    return 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-10)
+
+
+def _runs(mask: np.ndarray):
+    """Return (start, end) frame indices of the True runs in a boolean array."""
+    padded = np.concatenate([[False], mask, [False]])
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def detect_speech(audio: np.ndarray, sample_rate: int = SAMPLE_RATE):
+    """
+    Energy-based voice activity detection.
+    Returns (start, end) sample offsets of speech regions, none longer than VAD_MAX_SEGMENT_SECONDS.
+    """
+    frame_length = int(FRAME_SECONDS * sample_rate)
+    if len(audio) < frame_length:
+        return []
+    energy = frame_energy_db(audio, frame_length)
+    noise_floor = np.percentile(energy, 10)
+    speech = energy > max(noise_floor + VAD_THRESHOLD_DB, VAD_MIN_ENERGY_DB)
+
+    # Bridge short pauses, then drop bursts that are too short to be speech
+    min_silence = int(VAD_MIN_SILENCE_SECONDS / FRAME_SECONDS)
+    for start, end in _runs(~speech):
+        if 0 < start and end < len(speech) and end - start < min_silence:
+            speech[start:end] = True
+    min_speech = int(VAD_MIN_SPEECH_SECONDS / FRAME_SECONDS)
+    regions = [(start, end) for start, end in _runs(speech) if end - start >= min_speech]
+
+    pad = int(VAD_PAD_SECONDS / FRAME_SECONDS)
+    max_frames = int(VAD_MAX_SEGMENT_SECONDS / FRAME_SECONDS)
+    segments = []
+    for start, end in regions:
+        start, end = max(0, start - pad), min(len(speech), end + pad)
+        if segments and start <= segments[-1][1]:
+            start = segments.pop()[0]
+        # Split over-long regions at their quietest frame in the second half of the allowed span
+        while end - start > max_frames:
+            search = energy[start + max_frames // 2:start + max_frames]
+            cut = start + max_frames // 2 + int(np.argmin(search))
+            segments.append((start, cut))
+            start = cut
+        segments.append((start, end))
+
+    return [(start * frame_length, min(len(audio), end * frame_length)) for start, end in segments]
+
+
+def pack_segments(segments, sample_rate: int = SAMPLE_RATE, max_seconds: float = VAD_MAX_SEGMENT_SECONDS):
+    """
+    Group neighbouring speech regions into spans of at most `max_seconds`.
+    Whisper pads every input to a 30 s window, so decoding one packed span
+    costs the same as decoding a single short region.
+    """
+    max_samples = int(max_seconds * sample_rate)
+    packed = []
+    for start, end in segments:
+        if packed and end - packed[-1][0] <= max_samples:
+            packed[-1] = (packed[-1][0], end)
+        else:
+            packed.append((start, end))
+    return packed
+
+
+def speech_spans(audio: np.ndarray, sample_rate: int = SAMPLE_RATE):
+    """
+    Speech spans to transcribe, packed with pack_segments(), or None when the recording
+    should be transcribed whole: the detector kept less than VAD_MIN_SPEECH_RATIO of the
+    frames above VAD_MIN_ENERGY_DB, as happens with a steady tone or speech under constant
+    noise, where the noise floor estimate is the signal itself.
+    """
+    frame_length = int(FRAME_SECONDS * sample_rate)
+    if len(audio) < frame_length:
+        return []
+    audible = int(np.count_nonzero(frame_energy_db(audio, frame_length) > VAD_MIN_ENERGY_DB))
+    if not audible:
+        return []
+    segments = detect_speech(audio, sample_rate)
+    kept = sum(end - start for start, end in segments) // frame_length
+    if kept < VAD_MIN_SPEECH_RATIO * audible:
+        logger.warning(f"VAD kept {kept * FRAME_SECONDS:.1f}s of {audible * FRAME_SECONDS:.1f}s of audible audio, "
+                       f"transcribing the whole recording instead")
+        return None
+    return pack_segments(segments, sample_rate)
@@ -0,0 +1,139 @@
+import itertools
+import logging
+import os
+import threading
+import types
+
+from metrics import process_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("openai-whisper", "ctranslate2")
+# "openai-whisper" runs the PyTorch models, "ctranslate2" runs faster-whisper (optional dependency)
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "openai-whisper")
+# CTranslate2 weight type: int8 and int8_float32 for CPU, float16 for GPU
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+# Intra-op threads per model instance (0 splits the cores evenly across the workers)
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+# Directory of converted CTranslate2 models, one sub-directory per model size; empty fetches them from the Hub
+WHISPER_CT2_MODEL_DIR = os.getenv("WHISPER_CT2_MODEL_DIR", "")
+
+_cpu_threads = WHISPER_CPU_THREADS
+_progress = threading.local()
+_progress_hook_installed = False
+
+
+def _install_progress_hook():
+    """Route openai-whisper's tqdm bars to the calling thread's progress callback."""
+    global _progress_hook_installed
+    if _progress_hook_installed:
+        return
+    import tqdm
+    import whisper.transcribe as whisper_transcribe
+
+    class _ProgressBar(tqdm.tqdm):
+        def update(self, n=1):
+            callback = getattr(_progress, "callback", None)
+            if callback is not None and self.total:
+                self.frames_done = getattr(self, "frames_done", 0) + n
+                # Whisper counts mel frames, 100 per second of audio
+                callback(self.frames_done / 100, self.total / 100)
+            return super().update(n)
+
+    # Whisper reports progress through tqdm only
+    whisper_transcribe.tqdm = types.SimpleNamespace(tqdm=_ProgressBar)
+    _progress_hook_installed = True
+
+
+def _segment(start: float, end: float, text: str):
+    return {"start": start, "end": end, "text": text.strip()}
+
+
+class OpenAIWhisperEngine:
+    """The reference PyTorch implementation."""
+
+    backend = "openai-whisper"
+
+    def __init__(self, model):
+        self.model = model
+        self.memory_bytes = sum(
+            t.numel() * t.element_size() for t in itertools.chain(model.parameters(), model.buffers())
+        )
+
+    def transcribe(self, audio, language: str = "en", initial_prompt: str = None,
+                   condition_on_previous_text: bool = True, progress_callback=None):
+        _progress.callback = progress_callback
+        try:
+            result = self.model.transcribe(audio, language=language, initial_prompt=initial_prompt,
+                                           condition_on_previous_text=condition_on_previous_text)
+        finally:
+            _progress.callback = None
+        return {
+            "text": result["text"],
+            "segments": [_segment(s["start"], s["end"], s["text"]) for s in result["segments"]],
+        }
+
+
+class CTranslate2Engine:
+    """faster-whisper on CTranslate2, with int8 weights on CPU by default."""
+
+    backend = "ctranslate2"
+
+    def __init__(self, model, memory_bytes: int = 0):
+        self.model = model
+        # CTranslate2 does not report its allocations; the RSS growth while loading stands in for it
+        self.memory_bytes = memory_bytes
+
+    def transcribe(self, audio, language: str = "en", initial_prompt: str = None,
+                   condition_on_previous_text: bool = True, progress_callback=None):
+        # Greedy decoding, as openai-whisper's transcribe() does by default
+        segments, info = self.model.transcribe(audio, language=language, initial_prompt=initial_prompt,
+                                               condition_on_previous_text=condition_on_previous_text,
+                                               beam_size=1)
+        text = []
+        results = []
+        # Segments are decoded lazily while the generator is consumed
+        for segment in segments:
+            text.append(segment.text)
+            results.append(_segment(segment.start, segment.end, segment.text))
+            if progress_callback is not None and info.duration:
+                progress_callback(min(segment.end, info.duration), info.duration)
+        return {"text": "".join(text), "segments": results}
+
+
+def configure_cpu_threads(threads: int):
+    """Set the intra-op thread count used by models loaded from now on (WHISPER_CPU_THREADS wins)."""
+    global _cpu_threads
+    _cpu_threads = WHISPER_CPU_THREADS or threads
+    if WHISPER_BACKEND == "openai-whisper":
+        import torch
+
+        torch.set_num_threads(_cpu_threads)
+
+
+def backend_settings():
+    """Settings that change the decoded text, for cache keys and /health."""
+    if WHISPER_BACKEND == "ctranslate2":
+        return {"backend": WHISPER_BACKEND, "compute_type": WHISPER_COMPUTE_TYPE}
+    return {"backend": WHISPER_BACKEND}
+
+
+def load_engine(name: str, device: str):
+    """Load one model instance for the configured backend."""
+    if WHISPER_BACKEND not in BACKENDS:
+        raise ValueError(f"Unknown Whisper backend: {WHISPER_BACKEND}")
+    if WHISPER_BACKEND == "ctranslate2":
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise RuntimeError("WHISPER_BACKEND=ctranslate2 requires the faster-whisper package") from e
+        path = os.path.join(WHISPER_CT2_MODEL_DIR, name) if WHISPER_CT2_MODEL_DIR else name
+        rss_before = process_rss_bytes()
+        model = WhisperModel(path, device=device, compute_type=WHISPER_COMPUTE_TYPE,
+                             cpu_threads=_cpu_threads, num_workers=1)
+        return CTranslate2Engine(model, max(0, process_rss_bytes() - rss_before))
+    # Imported here so the ctranslate2 backend runs without openai-whisper and torch installed
+    import whisper
+
+    _install_progress_hook()
+    return OpenAIWhisperEngine(whisper.load_model(name, device=device))
@@ -0,0 +1,150 @@
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from model_registry import registry
+from batcher import BATCHING_ENABLED, BATCH_WORKERS
+from whisper_backends import configure_cpu_threads, WHISPER_CPU_THREADS
+from logging_setup import request_id, setup_logging
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# "thread" shares one process (one model copy per worker thread), "process" runs one model per process
+WORKER_MODE = os.getenv("TRANSCRIBE_WORKER_MODE", "thread")
+WORKER_COUNT = int(os.getenv("TRANSCRIBE_WORKERS", max(1, (os.cpu_count() or 1) // 4)))
+# Requests allowed to wait for a free worker before new ones are rejected
+MAX_QUEUE = int(os.getenv("TRANSCRIBE_MAX_QUEUE", WORKER_COUNT * 2))
+RETRY_AFTER_SECONDS = int(os.getenv("TRANSCRIBE_RETRY_AFTER", "10"))
+
+
+class QueueFullError(Exception):
+    """Raised when the transcription queue cannot accept more work."""
+
+    def __init__(self, retry_after: int = RETRY_AFTER_SECONDS):
+        super().__init__("Transcription queue is full, retry later")
+        self.retry_after = retry_after
+
+
+def _cpu_threads_per_worker(workers: int) -> int:
+    if WHISPER_CPU_THREADS:
+        return WHISPER_CPU_THREADS
+    if BATCHING_ENABLED:
+        # Workers only wait on the batcher; the cores go to the batch loops
+        workers = BATCH_WORKERS
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _init_process_worker(threads: int):
+    setup_logging()
+    configure_cpu_threads(threads)
+    registry.warm_up()
+    registry.start_sweeper()
+
+
+def _run_queued(queued_at: float, fn, args, kwargs):
+    STAGE_SECONDS.observe(time.perf_counter() - queued_at, stage="queue_wait")
+    return fn(*args, **kwargs)
+
+
+def _run_in_process(rid: str, fn, args, kwargs):
+    request_id.set(rid)
+    return fn(*args, **kwargs)
+
+
+class TranscriptionExecutor:
+    """
+    Runs blocking transcription work on a bounded pool of Whisper workers.
+
+    At most `workers` jobs run at once and `max_queue` more may wait; anything
+    beyond that is rejected with QueueFullError so callers can apply backpressure.
+    """
+
+    def __init__(self, mode: str = WORKER_MODE, workers: int = WORKER_COUNT, max_queue: int = MAX_QUEUE):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown worker mode: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    def start(self):
+        if self._pool is not None:
+            return
+        threads = _cpu_threads_per_worker(self.workers)
+        if self.mode == "process":
+            # Spawn rather than fork: this process already holds torch and live threads (job runner,
+            # event loop), whose locks a forked child could inherit mid-use and deadlock on
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(threads,),
+            )
+        else:
+            configure_cpu_threads(threads)
+            registry.max_replicas = self.workers
+            registry.start_sweeper()
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="whisper")
+        logger.info(f"Started {self.workers} {self.mode} transcription worker(s) "
+                    f"with {threads} CPU thread(s) each, queue limit {self.max_queue}")
+
+    def shutdown(self):
+        registry.stop_sweeper()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule `fn` on a worker and return a concurrent.futures.Future."""
+        if self._pool is None:
+            self.start()
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise QueueFullError()
+            self._pending += 1
+        try:
+            if self.mode == "process":
+                future = self._pool.submit(_run_in_process, request_id.get(), fn, args, kwargs)
+            else:
+                # The copied context keeps the caller's request ID on the worker's log lines
+                future = self._pool.submit(contextvars.copy_context().run, _run_queued, time.perf_counter(),
+                                           fn, args, kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Await `fn` on a worker without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "running": min(pending, self.workers),
+            "queued": max(0, pending - self.workers),
+            "max_queue": self.max_queue,
+        }
+
+
+executor = TranscriptionExecutor()
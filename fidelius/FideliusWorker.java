@@ -0,0 +1,62 @@
+import com.google.gson.Gson;
+import com.google.gson.JsonObject;
+
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.nio.charset.StandardCharsets;
+
+/*
+ ** Long-lived Fidelius worker.
+ **
+ ** Reads one JSON request per line from stdin, {"id": 1, "args": ["e", ...]}, runs the
+ ** Fidelius CLI entry point in this JVM with those arguments and writes one JSON response
+ ** per line to stdout, {"id": 1, "ok": true, "output": "<what the CLI printed>"}.
+ ** Arguments are passed in memory, so keys and payloads never touch disk.
+ **
+ ** Launched by main.py from the CLI distribution's lib folder (Java 11+ single-file source):
+ **   java -cp "fidelius-cli-<version>/lib/*" FideliusWorker.java
+ */
+public class FideliusWorker {
+	public static void main(String[] args) throws Exception {
+		PrintStream protocolOut = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+		BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+		// Anything printed outside a request goes to stderr, so it cannot corrupt the protocol
+		System.setOut(System.err);
+
+		Method cliMain = Class.forName("com.mgrm.fidelius.FideliusApplication").getMethod("main", String[].class);
+		Gson gson = new Gson();
+		protocolOut.println("{\"ready\":true}");
+
+		String line;
+		while ((line = in.readLine()) != null) {
+			if (line.trim().isEmpty()) {
+				continue;
+			}
+			JsonObject request = gson.fromJson(line, JsonObject.class);
+			JsonObject response = new JsonObject();
+			response.add("id", request.get("id"));
+
+			ByteArrayOutputStream captured = new ByteArrayOutputStream();
+			System.setOut(new PrintStream(captured, true, "UTF-8"));
+			try {
+				cliMain.invoke(null, (Object) gson.fromJson(request.get("args"), String[].class));
+				response.addProperty("ok", true);
+			} catch (Throwable e) {
+				Throwable cause = e instanceof InvocationTargetException ? e.getCause() : e;
+				response.addProperty("ok", false);
+				response.addProperty("error", String.valueOf(cause));
+			} finally {
+				System.out.flush();
+				System.setOut(System.err);
+			}
+			response.addProperty("output", captured.toString("UTF-8"));
+			protocolOut.println(gson.toJson(response));
+		}
+	}
+}
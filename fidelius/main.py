@@ -1,8 +1,21 @@
 import os
+import time
 import uuid
 import json
+import queue
+import atexit
+import asyncio
+import threading
 import subprocess
 import platform
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    # Only needed to persist the key-material pool
+    Fernet = None
 
 from utils import getFideliusVersion
 
@@ -25,7 +38,189 @@ cwd_dir = os.path.dirname(binPath)
 if not os.path.isdir(cwd_dir):
     print(f"ERROR: cwd_dir '{cwd_dir}' is not a valid directory!")
 
+# Resident JVM that serves every call; set FIDELIUS_WORKER=0 to launch the CLI per call instead
+useWorker = os.environ.get('FIDELIUS_WORKER', '1') == '1'
+# Resident JVMs, and so concurrent Fidelius calls, at most
+fideliusWorkerCount = max(1, int(os.environ.get('FIDELIUS_WORKERS', '2')))
+# Seconds a worker may take to start (compiling FideliusWorker.java) and to answer one call
+workerStartTimeout = float(os.environ.get('FIDELIUS_WORKER_START_TIMEOUT', '60'))
+workerRequestTimeout = float(os.environ.get('FIDELIUS_WORKER_TIMEOUT', '30'))
+# After a failed start, calls go straight to the CLI for this long; the wait doubles on every failure
+workerRetrySeconds = float(os.environ.get('FIDELIUS_WORKER_RETRY_SECONDS', '60'))
+workerMaxRetrySeconds = 3600
+# Pre-generated ECDH key material (0 generates every key pair on demand)
+keyPoolSize = int(os.environ.get('FIDELIUS_KEY_POOL_SIZE', '16'))
+# The pool is topped up once it holds this many key pairs or fewer
+keyPoolLowWaterMark = int(os.environ.get('FIDELIUS_KEY_POOL_LOW_WATER', '4'))
+# Encrypted file that keeps the pool across restarts; needs FIDELIUS_KEY_POOL_SECRET (a Fernet key).
+# One process uses the file at a time (it is locked); others keep their pools in memory only.
+keyPoolStorePath = os.environ.get('FIDELIUS_KEY_POOL_PATH', '')
+keyPoolStoreSecret = os.environ.get('FIDELIUS_KEY_POOL_SECRET', '')
+libPath = os.path.join(dirname, f'fidelius-cli-{fideliusVersion}', 'lib')
+workerSourcePath = os.path.join(dirname, 'FideliusWorker.java')
+javaPath = os.path.join(os.environ['JAVA_HOME'], 'bin', 'java') if os.environ.get('JAVA_HOME') else 'java'
+
+
+class FideliusWorkerError(Exception):
+    """Raised when the resident worker cannot be started or dies mid-request."""
+
+
+class FideliusWorkerStartError(FideliusWorkerError):
+    """Raised when the worker JVM cannot be started, e.g. on Java 8, which cannot run a source file."""
+
+
+class FideliusWorker:
+    """
+    One long-lived JVM running FideliusWorker.java. Requests and responses are JSON
+    lines over its stdin/stdout, so the JVM starts once instead of once per call and
+    parameters are handed over in memory. Calls are served one at a time.
+    """
+
+    def __init__(self):
+        self.process = None
+        self.lines = None
+        self.lock = threading.Lock()
+        self.requestId = 0
+
+    def start(self):
+        try:
+            self.process = subprocess.Popen(
+                [javaPath, '-cp', os.path.join(libPath, '*'), workerSourcePath],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                encoding='UTF-8',
+                cwd=cwd_dir
+            )
+        except OSError as e:
+            raise FideliusWorkerStartError(f"could not launch {javaPath}: {e}")
+        # stdout is read on a thread so every wait for the JVM can time out
+        self.lines = queue.Queue()
+        threading.Thread(target=self.readLines, args=(self.process.stdout, self.lines),
+                         name='fidelius-worker-stdout', daemon=True).start()
+        ready = self.readLine(workerStartTimeout)
+        if not ready:
+            self.close(kill=True)
+            reason = 'timed out' if ready is None else 'exited'
+            raise FideliusWorkerStartError(f"worker {reason} during start-up")
+
+    @staticmethod
+    def readLines(stdout, lines):
+        for line in stdout:
+            lines.put(line)
+        lines.put('')
+
+    def readLine(self, timeout):
+        """Next line from the worker, '' once it has exited, or None after `timeout` seconds."""
+        try:
+            return self.lines.get(timeout=timeout or None)
+        except queue.Empty:
+            return None
+
+    def execute(self, args):
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.start()
+            self.requestId += 1
+            try:
+                self.process.stdin.write(json.dumps({'id': self.requestId, 'args': list(args)}) + '\n')
+                self.process.stdin.flush()
+                line = self.readLine(workerRequestTimeout)
+            except OSError:
+                line = ''
+            if line is None:
+                self.close(kill=True)
+                raise FideliusWorkerError(f"worker did not answer within {workerRequestTimeout:g}s")
+            if not line:
+                # The CLI may have called System.exit(); a new worker is started on the next call
+                self.close()
+                raise FideliusWorkerError("worker exited while handling a request")
+
+        response = json.loads(line)
+        if not response['ok']:
+            print(f"ERROR · Fidelius worker request failed\nOutput:\n{response['output']}\nException: {response['error']}")
+            return None
+        try:
+            return json.loads(response['output'])
+        except Exception as e:
+            print(f"ERROR · Fidelius worker JSON parse failed\nOutput:\n{response['output']}\nException: {e}")
+            return None
+
+    def close(self, kill=False):
+        if self.process is not None:
+            if kill:
+                self.process.kill()
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+
+
+class FideliusWorkerPool:
+    """
+    Bounded set of resident workers; each call leases an idle one. Workers start on first use.
+    When a worker fails to start, the pool reports itself unavailable for a while (doubling up
+    to an hour) instead of launching a JVM that will fail again on every call.
+    """
+
+    def __init__(self, size, retrySeconds=workerRetrySeconds):
+        self.workers = [FideliusWorker() for _ in range(size)]
+        # Most recently used first, so light traffic keeps a single JVM busy
+        self.idle = queue.LifoQueue()
+        for worker in self.workers:
+            self.idle.put(worker)
+        self.retrySeconds = retrySeconds
+        self.retryDelay = retrySeconds
+        self.retryAt = 0.0
+        self.stateLock = threading.Lock()
+
+    def available(self):
+        return time.monotonic() >= self.retryAt
+
+    def execute(self, args):
+        if not self.available():
+            raise FideliusWorkerError("worker start-up failed recently")
+        worker = self.idle.get()
+        try:
+            result = worker.execute(args)
+        except FideliusWorkerStartError as e:
+            with self.stateLock:
+                delay = self.retryDelay
+                self.retryAt = time.monotonic() + delay
+                self.retryDelay = min(delay * 2, workerMaxRetrySeconds)
+            raise FideliusWorkerStartError(f"{e}; not retrying for {delay:g}s") from e
+        finally:
+            self.idle.put(worker)
+        with self.stateLock:
+            self.retryDelay = self.retrySeconds
+        return result
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+
+fideliusWorkerPool = FideliusWorkerPool(fideliusWorkerCount)
+atexit.register(fideliusWorkerPool.close)
+# Threads that wait on the pool for the batch and async APIs, one per worker
+batchExecutor = ThreadPoolExecutor(max_workers=fideliusWorkerCount, thread_name_prefix='fidelius')
+
+
 def execFideliusCli(args):
+    if useWorker and fideliusWorkerPool.available():
+        try:
+            return fideliusWorkerPool.execute(args)
+        except FideliusWorkerError as e:
+            print(f"WARNING · Fidelius worker unavailable ({e}), falling back to the CLI")
+    return execFideliusCliProcess(args)
+
+
+def execFideliusCliProcess(args):
     fideliusCommand = [binPath] + args
     shell_flag = True if platform.system() == 'Windows' else False
 
@@ -53,13 +248,20 @@ def execFideliusCli(args):
         return None
 
 
-def getEcdhKeyMaterial():
+def generateEcdhKeyMaterial():
     result = execFideliusCli(['gkm'])
     if result is None:
         print("Failed to get ECDH key material.")
     return result
 
 
+def getEcdhKeyMaterial():
+    """Hand out a fresh, never before used key pair, from the pool when it is enabled."""
+    if keyPoolSize <= 0:
+        return generateEcdhKeyMaterial()
+    return keyMaterialPool.take()
+
+
 def writeParamsToFile(*params):
     fileContents = '\n'.join(params)
     filePath = os.path.join(dirname, 'temp', f'{str(uuid.uuid4())}.txt')
@@ -73,34 +275,218 @@ def removeFileAtPath(filePath):
     os.remove(filePath)
 
 
+def execFideliusParams(params):
+    """Run an encrypt/decrypt command; only the per-call CLI fallback goes through a params file."""
+    if useWorker and fideliusWorkerPool.available():
+        try:
+            return fideliusWorkerPool.execute(params)
+        except FideliusWorkerError as e:
+            print(f"WARNING · Fidelius worker unavailable ({e}), falling back to the CLI")
+    # Long keys can exceed the command line limit, so the CLI reads them from a file
+    paramsFilePath = writeParamsToFile(*params)
+    try:
+        return execFideliusCliProcess(['-f', paramsFilePath])
+    finally:
+        removeFileAtPath(paramsFilePath)
+
+
 def encryptData(encryptParams):
-    paramsFilePath = writeParamsToFile(
+    return execFideliusParams([
         'e',
         encryptParams['stringToEncrypt'],
         encryptParams['senderNonce'],
         encryptParams['requesterNonce'],
         encryptParams['senderPrivateKey'],
         encryptParams['requesterPublicKey']
-    )
-    result = execFideliusCli(['-f', paramsFilePath])
-    removeFileAtPath(paramsFilePath)
-    return result
+    ])
 
 
 def decryptData(decryptParams):
-    paramsFilePath = writeParamsToFile(
+    return execFideliusParams([
         'd',
         decryptParams['encryptedData'],
         decryptParams['requesterNonce'],
         decryptParams['senderNonce'],
         decryptParams['requesterPrivateKey'],
         decryptParams['senderPublicKey']
-    )
-    result = execFideliusCli(['-f', paramsFilePath])
-    removeFileAtPath(paramsFilePath)
+    ])
+
+
+def lockKeyPoolStore(storePath):
+    """Take an exclusive lock on storePath + '.lock'; returns its descriptor, or None if another process holds it."""
+    fd = os.open(f'{storePath}.lock', os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if platform.system() == 'Windows':
+            import msvcrt
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class KeyMaterialPool:
+    """
+    Key pairs generated ahead of demand. A background thread refills the pool whenever it
+    drops to the low-water mark, one key pair at a time so other Fidelius calls are not kept
+    waiting behind a burst of key generation, and take() hands each key pair out exactly once. With a
+    store path and secret the pool is kept in a Fernet-encrypted file, rewritten after every
+    change so a key pair handed out before a restart is never handed out again. That holds across
+    processes too: the file is locked while a pool uses it, and a pool that finds it locked stays
+    in memory only.
+    """
+
+    def __init__(self, size=keyPoolSize, lowWaterMark=keyPoolLowWaterMark,
+                 storePath=keyPoolStorePath, storeSecret=keyPoolStoreSecret):
+        self.size = max(1, size)
+        self.lowWaterMark = min(max(0, lowWaterMark), self.size - 1)
+        self.keys = deque()
+        self.cond = threading.Condition()
+        self.thread = None
+        self.stopped = False
+        self.storePath = storePath
+        self.storeLock = None
+        self.fernet = None
+        if storePath:
+            if Fernet is None or not storeSecret:
+                print("WARNING · key pool persistence needs the cryptography package and FIDELIUS_KEY_POOL_SECRET; "
+                      "keeping the pool in memory only")
+                self.storePath = ''
+            else:
+                self.fernet = Fernet(storeSecret.encode())
+
+    def start(self):
+        with self.cond:
+            if self.thread is not None:
+                return
+            self.stopped = False
+            if self.storePath:
+                self.storeLock = lockKeyPoolStore(self.storePath)
+                if self.storeLock is None:
+                    print(f"WARNING · the key pool at {self.storePath} is in use by another process; "
+                          "keeping this pool in memory only")
+                    self.storePath = ''
+                else:
+                    # Another process may have used the file since this one last held the lock
+                    self.keys = deque(self.load())
+            self.thread = threading.Thread(target=self.refillLoop, name='fidelius-key-pool', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=10)
+            self.thread = None
+        with self.cond:
+            if self.storeLock is not None:
+                os.close(self.storeLock)
+                self.storeLock = None
+
+    def take(self):
+        self.start()
+        with self.cond:
+            keyMaterial = self.keys.popleft() if self.keys else None
+            if keyMaterial is not None:
+                self.persist()
+            self.cond.notify_all()
+        if keyMaterial is None:
+            # Demand outran the refill thread
+            keyMaterial = generateEcdhKeyMaterial()
+        return keyMaterial
+
+    def available(self):
+        with self.cond:
+            return len(self.keys)
+
+    def refillLoop(self):
+        while True:
+            with self.cond:
+                while not self.stopped and len(self.keys) > self.lowWaterMark:
+                    self.cond.wait()
+                if self.stopped:
+                    return
+                missing = self.size - len(self.keys)
+            for _ in range(missing):
+                keyMaterial = generateEcdhKeyMaterial()
+                with self.cond:
+                    if self.stopped:
+                        return
+                    if keyMaterial is None:
+                        # Key generation is failing; retry later instead of spinning
+                        self.cond.wait(5)
+                        break
+                    self.keys.append(keyMaterial)
+                    self.persist()
+
+    def load(self):
+        if not self.storePath or not os.path.exists(self.storePath):
+            return []
+        try:
+            with open(self.storePath, 'rb') as f:
+                return json.loads(self.fernet.decrypt(f.read()))
+        except (InvalidToken, ValueError) as e:
+            print(f"WARNING · could not read the key pool at {self.storePath} ({type(e).__name__}), starting empty")
+            return []
+
+    def persist(self):
+        if not self.storePath:
+            return
+        tempPath = f'{self.storePath}.tmp'
+        fd = os.open(tempPath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self.fernet.encrypt(json.dumps(list(self.keys)).encode()))
+        os.replace(tempPath, self.storePath)
+
+
+keyMaterialPool = KeyMaterialPool()
+atexit.register(keyMaterialPool.stop)
+
+
+def runBatchItem(operation, params):
+    try:
+        result = operation(params)
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+    if result is None:
+        return {'error': 'Fidelius returned no result'}
     return result
 
 
+def encryptDataBatch(encryptParamsList):
+    """
+    Encrypt many payloads, each with its own nonces and keys, across the worker pool.
+    Returns one result per item in input order: the CLI's output, or {'error': ...} for that item.
+    """
+    return list(batchExecutor.map(lambda params: runBatchItem(encryptData, params), encryptParamsList))
+
+
+def decryptDataBatch(decryptParamsList):
+    """Decrypt many payloads across the worker pool; results as for encryptDataBatch()."""
+    return list(batchExecutor.map(lambda params: runBatchItem(decryptData, params), decryptParamsList))
+
+
+async def encryptDataAsync(encryptParams):
+    """encryptData() for asyncio callers: runs on the pool without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(batchExecutor, runBatchItem, encryptData, encryptParams)
+
+
+async def decryptDataAsync(decryptParams):
+    return await asyncio.get_running_loop().run_in_executor(batchExecutor, runBatchItem, decryptData, decryptParams)
+
+
+async def encryptDataBatchAsync(encryptParamsList):
+    return list(await asyncio.gather(*(encryptDataAsync(params) for params in encryptParamsList)))
+
+
+async def decryptDataBatchAsync(decryptParamsList):
+    return list(await asyncio.gather(*(decryptDataAsync(params) for params in decryptParamsList)))
+
+
 def runExample(stringToEncrypt):
     requesterKeyMaterial = getEcdhKeyMaterial()
     senderKeyMaterial = getEcdhKeyMaterial()